@@ -0,0 +1,46 @@
+# Module for loading image assets lazily.
+#
+# The settings modules only name the images of machines and UI elements (by file path).
+# An image is loaded from disk and converted to the pixel format of the display the first time it is used,
+# and cached from then on, so importing the settings (e.g. from tools that only need constants) loads no images.
+# pygame itself is only imported when the first image is loaded, as importing it takes longer than the settings.
+
+# loaded images, keyed by file path
+loaded_images = {}
+
+# paths of the loaded images that have been converted to the pixel format of the display
+converted_paths = set()
+
+# Returns the image under the passed path, loading it from disk only on the first call for that path.
+# The image is converted to the pixel format of the display (keeping its per-pixel alpha) for fast blitting.
+# If no display mode has been set yet (e.g. in headless tools), the image is cached unconverted
+# and converted on the first call after a display mode has been set.
+def load_image(path):
+    import pygame
+
+    image = loaded_images.get(path)
+    if image is None:
+        image = pygame.image.load(path)
+        loaded_images[path] = image
+
+    if path not in converted_paths and pygame.display.get_surface() is not None:
+        image = image.convert_alpha()
+        loaded_images[path] = image
+        converted_paths.add(path)
+
+    return image
+
+# A list of images that is indexed like a list of pygame.Surface objects
+# but only holds the paths of the images and loads them on access (see load_image).
+class ImageList:
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        return load_image(self.paths[index])
+
+    def __iter__(self):
+        return (load_image(path) for path in self.paths)
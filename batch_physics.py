@@ -0,0 +1,282 @@
+# Module for simulating many machines on the same race in lockstep.
+#
+# Holds the physics state of N machines in numpy arrays (one entry per machine)
+# and advances all of them with vectorized operations in every step.
+# The physics are the same as in Player.racing_mode_movement and Player.update,
+# collision queries against the track are done for all machines at once (see CollisionRectSet).
+#
+# The machines do not interact with each other,
+# so this can be used to evaluate many machine parameter combinations or driving policies at once.
+
+import numpy
+
+from settings.debug_settings import COLLISION_DETECTION_OFF
+from settings.machine_settings import PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT
+from settings.machine_settings import HIT_COST_SPEED_FACTOR, MIN_BOUNCE_BACK_FORCE, OBSTACLE_HIT_SPEED_RETENTION
+from settings.simulation_settings import SIMULATION_TIMESTEP
+
+# column indices of the controls in the input arrays passed to MachineBatch.step
+INPUT_ACCELERATE = 0
+INPUT_BRAKE = 1
+INPUT_BOOST = 2
+INPUT_LEFT = 3
+INPUT_RIGHT = 4
+NUM_INPUTS = 5
+
+# names of the physics parameters of a machine (attributes of the Machine class) used by the batch physics
+MACHINE_PARAMETERS = [
+    "max_speed", "boosted_max_speed", "acceleration", "boosted_acceleration", "brake", "speed_loss",
+    "boosted_speed_loss", "max_centri", "centri_increase", "centri_decrease", "jump_duration_multiplier",
+    "boost_duration", "max_energy", "boost_cost", "hit_cost", "recover_speed", "rotation_speed"
+]
+
+class MachineBatch:
+    # Parameters:
+    # machines - list of the N simulated machines (Machine objects, may contain the same machine several times)
+    # race - the race that all machines are driving
+    # timestep - time (in seconds) that a single step advances the race by
+    def __init__(self, machines, race, timestep = SIMULATION_TIMESTEP):
+        self.race = race
+        self.track = race.race_track
+        self.timestep = timestep
+        self.size = len(machines)
+
+        # one array per physics parameter (entry i belongs to machine i)
+        self.params = {
+            name: numpy.array([getattr(machine, name) for machine in machines], dtype = numpy.float64)
+            for name in MACHINE_PARAMETERS
+        }
+
+        self.reset()
+
+    # (Re-)starts the race for all machines.
+    def reset(self):
+        n = self.size
+
+        # simulated time since race start (in seconds), the same for all machines
+        self.time = 0.0
+        self.steps = 0
+
+        # physics state
+        self.position = numpy.tile(numpy.array([self.race.init_player_pos_x, self.race.init_player_pos_y], dtype = numpy.float64), (n, 1))
+        self.angle = numpy.full(n, self.race.init_player_angle, dtype = numpy.float64)
+        self.speed = numpy.zeros(n)
+        self.centri = numpy.zeros(n)
+        self.energy = self.params["max_energy"].copy()
+
+        # status flags and timestamps (see Player)
+        self.steering_left = numpy.zeros(n, dtype = numpy.bool_)
+        self.steering_right = numpy.zeros(n, dtype = numpy.bool_)
+        self.jumping = numpy.zeros(n, dtype = numpy.bool_)
+        self.jumped_off_timestamp = numpy.zeros(n)
+        self.current_jump_duration = numpy.zeros(n)
+        self.boosted = numpy.zeros(n, dtype = numpy.bool_)
+        self.last_boost_started_timestamp = numpy.zeros(n)
+        self.has_boost_power = numpy.zeros(n, dtype = numpy.bool_)
+        self.finished = numpy.zeros(n, dtype = numpy.bool_)
+        self.destroyed = numpy.zeros(n, dtype = numpy.bool_)
+
+        # lap counting (see Race.update_lap_count)
+        self.completed_laps = numpy.zeros(n, dtype = numpy.int64)
+        self.key_checkpoints_passed = numpy.zeros((n, len(self.track.key_checkpoints)), dtype = numpy.bool_)
+
+        # statistics: simulated time at which each lap was completed (nan if not completed) and number of wall hits
+        self.lap_completion_times = numpy.full((n, self.race.required_laps), numpy.nan)
+        self.wall_hits = numpy.zeros(n, dtype = numpy.int64)
+
+    # Returns True if and only if the race is over for all machines (finished or destroyed).
+    def all_over(self):
+        return bool(numpy.all(self.finished | self.destroyed))
+
+    # Advances all machines by a single step.
+    #
+    # Parameters:
+    # inputs - N x NUM_INPUTS boolean array of the controls of each machine in this step (see INPUT_* columns)
+    # delta - time to advance the race by (the fixed timestep if None)
+    def step(self, inputs, delta = None):
+        if delta is None:
+            delta = self.timestep
+
+        self.time += delta
+        self.steps += 1
+
+        # destroyed machines do not move anymore (but are still checked against the track, see Player.update)
+        moving = ~self.destroyed
+        self.racing_mode_movement(inputs & moving[:, None], moving, delta)
+
+        self.update_environment(delta)
+
+    # Vectorized version of Player.racing_mode_movement for the machines in the passed mask.
+    def racing_mode_movement(self, inputs, moving, delta):
+        p = self.params
+        time = self.time
+
+        accelerate = inputs[:, INPUT_ACCELERATE]
+        brake = inputs[:, INPUT_BRAKE]
+        boost = inputs[:, INPUT_BOOST]
+        left = inputs[:, INPUT_LEFT]
+        right = inputs[:, INPUT_RIGHT]
+        not_finished = ~self.finished
+
+        # ------------ boost and steering ------------------
+
+        start_boost = boost & self.has_boost_power & ~self.boosted & (self.energy >= p["boost_cost"])
+        self.last_boost_started_timestamp[start_boost] = time
+        self.energy[start_boost] -= p["boost_cost"][start_boost]
+        self.boosted |= start_boost
+
+        steer_left = left & not_finished
+        self.steering_left[steer_left] = True
+        self.steering_right[steer_left] = False
+        self.angle[steer_left] += p["rotation_speed"][steer_left] * delta
+
+        steer_right = right & not_finished
+        self.steering_left[steer_right] = False
+        self.steering_right[steer_right] = True
+        self.angle[steer_right] -= p["rotation_speed"][steer_right] * delta
+
+        # ------------ updating speed ------------------
+
+        current_max_speed = numpy.where(self.boosted, p["boosted_max_speed"], p["max_speed"])
+        do_accelerate = accelerate & not_finished & ~(self.speed > current_max_speed)
+        do_brake = ~do_accelerate & brake & not_finished & ~self.jumping
+        do_lose_speed = moving & ~do_accelerate & ~do_brake & ~self.jumping
+
+        # acceleration
+        acceleration = numpy.where(self.boosted, p["boosted_acceleration"], p["acceleration"])
+        self.speed[do_accelerate] += acceleration[do_accelerate] * delta
+
+        # braking (towards 0, without overshooting)
+        self.approach_zero(do_brake, p["brake"] * delta)
+
+        # speed loss (towards 0, without overshooting)
+        speed_loss = numpy.where(self.boosted | (self.speed > p["max_speed"]), p["boosted_speed_loss"], p["speed_loss"]) * delta
+        self.approach_zero(do_lose_speed, speed_loss)
+
+        # ------------ centrifugal force ------------------
+
+        turning = moving & (left | right)
+        self.centri[turning] += p["centri_increase"][turning] * self.speed[turning] * delta
+        self.centri = numpy.where(turning, numpy.minimum(self.centri, p["max_centri"]), self.centri)
+
+        not_turning = moving & ~(left | right)
+        self.centri[not_turning] -= p["centri_decrease"][not_turning] * delta
+        worn_off = not_turning & (self.centri < 0)
+        self.centri[worn_off] = 0
+        self.steering_left[worn_off] = False
+        self.steering_right[worn_off] = False
+
+        # ------------ movement ------------------
+
+        sin_a = numpy.sin(self.angle)
+        cos_a = numpy.cos(self.angle)
+        speed_sin, speed_cos = self.speed * delta * sin_a, self.speed * delta * cos_a
+        cf_sin, cf_cos = self.centri * speed_sin * -1 * delta, self.centri * speed_cos * -1 * delta
+
+        # move forward if the machine stays on the track, bounce back otherwise
+        next_position = self.position + numpy.stack([speed_cos, speed_sin], axis = 1)
+        allowed = self.is_on_track(next_position) | self.jumping | COLLISION_DETECTION_OFF
+        self.position[moving & allowed] = next_position[moving & allowed]
+        self.hit_wall(moving & ~allowed, bounce_back = True)
+
+        # Centrifugal forces.
+        # Machines that are not steering test the forward position again (as in Player.racing_mode_movement).
+        next_position[self.steering_left, 0] = self.position[self.steering_left, 0] - cf_sin[self.steering_left]
+        next_position[self.steering_left, 1] = self.position[self.steering_left, 1] + cf_cos[self.steering_left]
+        next_position[self.steering_right, 0] = self.position[self.steering_right, 0] + cf_sin[self.steering_right]
+        next_position[self.steering_right, 1] = self.position[self.steering_right, 1] - cf_cos[self.steering_right]
+        allowed = self.is_on_track(next_position) | self.jumping | COLLISION_DETECTION_OFF
+        self.position[moving & allowed] = next_position[moving & allowed]
+        self.hit_wall(moving & ~allowed, bounce_back = False)
+
+    # Moves the speed of the machines in the passed mask towards 0 by the passed amounts
+    # (clamped to 0, machines do not change direction).
+    def approach_zero(self, mask, amounts):
+        forwards = mask & (self.speed > 0)
+        backwards = mask & (self.speed < 0)
+        self.speed[forwards] = numpy.maximum(self.speed[forwards] - amounts[forwards], 0)
+        self.speed[backwards] = numpy.minimum(self.speed[backwards] + amounts[backwards], 0)
+
+    # Handles the machines in the passed mask hitting the track border.
+    # With guard rails, the machines bounce back and lose energy (bounce_back = True)
+    # or lose their centrifugal force (bounce_back = False).
+    # Without guard rails, the machines are destroyed.
+    def hit_wall(self, mask, bounce_back):
+        if not numpy.any(mask):
+            return
+
+        self.wall_hits[mask] += 1
+
+        if not self.track.guard_rails_active():
+            self.destroyed |= mask
+            return
+
+        if bounce_back:
+            self.speed[mask] = -(self.speed[mask] * OBSTACLE_HIT_SPEED_RETENTION + MIN_BOUNCE_BACK_FORCE)
+            self.energy[mask] -= (numpy.abs(self.speed[mask]) * HIT_COST_SPEED_FACTOR) * self.params["hit_cost"][mask]
+        else:
+            # the centrifugal force is reset (the machine loses energy proportional to the reset force, i.e. none)
+            self.centri[mask] = 0
+
+        self.destroyed |= mask & (self.energy < 0)
+
+    # Vectorized version of the environment checks in Player.update (after the movement):
+    # lap counting, dash plates, ramps and recovery zones.
+    def update_environment(self, delta):
+        p = self.params
+        time = self.time
+
+        # ------------ lap counting (see Race.update_lap_count) ------------------
+
+        if self.key_checkpoints_passed.shape[1] > 0:
+            self.key_checkpoints_passed |= self.track.key_checkpoint_set.overlap_matrix(
+                self.position, PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT
+            )
+        on_finish_line = self.track.is_on_finish_line_batch(self.position, PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT)
+        completed_lap = on_finish_line & numpy.all(self.key_checkpoints_passed, axis = 1)
+        for i in numpy.nonzero(completed_lap)[0]:
+            if self.completed_laps[i] < self.race.required_laps:
+                self.lap_completion_times[i, self.completed_laps[i]] = time
+        self.completed_laps[completed_lap] += 1
+        self.key_checkpoints_passed[on_finish_line] = False
+
+        # ------------ dash plates and boost ------------------
+
+        on_dash_plate = self.track.is_on_dash_plate_batch(self.position, PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT)
+        start_boost = on_dash_plate & ~self.jumping & ~self.boosted
+        self.boosted |= start_boost
+        self.last_boost_started_timestamp[start_boost] = time
+        self.boosted &= ~(time - self.last_boost_started_timestamp > p["boost_duration"])
+
+        # ------------ ramps and jumps ------------------
+
+        on_ramp = self.track.is_on_ramp_batch(self.position, PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT)
+        start_jump = on_ramp & ~self.jumping
+        self.jumping |= start_jump
+        self.current_jump_duration[start_jump] = p["jump_duration_multiplier"][start_jump] * self.speed[start_jump]
+        self.jumped_off_timestamp[start_jump] = time
+
+        landing = self.jumping & (time - self.jumped_off_timestamp >= self.current_jump_duration)
+        if numpy.any(landing):
+            self.jumping &= ~landing
+
+            # machines landing out of the track bounds are destroyed
+            self.destroyed |= landing & ~self.is_on_track(self.position)
+
+        # ------------ recovery zones ------------------
+
+        on_recovery_zone = self.track.is_on_recovery_zone_batch(self.position, PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT)
+        recovering = on_recovery_zone & ~self.jumping
+        self.energy[recovering] = numpy.minimum(
+            self.energy[recovering] + p["recover_speed"][recovering] * delta,
+            p["max_energy"][recovering]
+        )
+
+        # ------------ race progress (see Player.update_race_progress) ------------------
+
+        self.finished |= self.completed_laps >= self.race.required_laps
+        self.has_boost_power |= self.completed_laps >= 1
+
+    # Determines for each of the passed positions whether the player collider at that position is on the track.
+    def is_on_track(self, positions):
+        return self.track.is_on_track_batch(positions, PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT)
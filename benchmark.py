@@ -0,0 +1,231 @@
+# Command-line tool for benchmarking the Mode7 renderer.
+#
+# Renders a canned camera path (see camera_path) over the floor and background textures of every race in LEAGUE_1_RACES
+# with every combination of the passed renderer variants (floor sampler, pixel format, texture layout, mipmapping,
+# render partition) and numba thread counts, without opening a window (unless a display is available anyway).
+# By default, every variant is run with 1 up to all threads, and the speedup over 1 thread is reported (thread scaling).
+#
+# The render kernels are compiled and warmed up before the measurement of each variant,
+# so the measured frames do not include any compilation.
+# For every combination, the frames per second, the percentiles of the frame times and the rendered pixels per second
+# are printed and written to a JSON file that can be compared across commits and machines.
+#
+# Example:
+# python benchmark.py results.json --samplers scanline --partitions rows,tiles --threads 1,2,4
+
+import os
+
+# no window is needed for benchmarking
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import itertools
+import json
+import platform
+import subprocess
+import time
+import types
+
+import numba
+import numpy
+import pygame
+
+from mode7 import Mode7
+
+from settings.renderer_settings import WIN_RES, CAM_DISTANCE, FLOOR_SAMPLERS, PIXEL_FORMATS, TEXTURE_LAYOUTS, RENDER_PARTITIONS
+from settings.renderer_settings import BENCHMARK_FRAMES, BENCHMARK_WARMUP_FRAMES
+from settings.league_settings import LEAGUE_1_RACES
+
+# Segments of the camera path: name, share of the frames, speed (units per frame), turn rate (radians per frame)
+# and angle (relative to the starting angle of the race) at the start of the segment.
+# The diagonal and fast rotation segments sample the floor texture across its rows (worst case for cache locality).
+CAMERA_PATH_SEGMENTS = [
+    ("straight", 0.25, 0.3, 0.0, 0.0),
+    ("diagonal", 0.25, 0.3, 0.0, numpy.pi / 4),
+    ("fast rotation", 0.25, 0.0, 0.15, 0.0),
+    ("curve", 0.25, 0.2, 0.02, numpy.pi / 2)
+]
+
+# Returns the canned camera path for the passed race with the passed number of frames
+# as an array of the camera position (x, y) and angle in every frame (one row per frame).
+# The path starts at the starting position of the player in the race.
+def camera_path(race, num_frames):
+    path = numpy.zeros((num_frames, 3))
+    position = numpy.array([race.init_player_pos_x, race.init_player_pos_y], dtype = numpy.float64)
+    frame = 0
+    for index, (name, share, speed, turn_rate, angle_offset) in enumerate(CAMERA_PATH_SEGMENTS):
+        # the last segment takes the remaining frames
+        last = num_frames if index == len(CAMERA_PATH_SEGMENTS) - 1 else frame + round(share * num_frames)
+        angle = race.init_player_angle + angle_offset
+        for frame in range(frame, last):
+            path[frame] = position[0], position[1], angle
+            position += speed * numpy.array([numpy.cos(angle), numpy.sin(angle)])
+            angle += turn_rate
+        frame = last
+    return path
+
+# Returns the pairs of floor and background textures of the passed races (each pair only once)
+# with the index of the first race using them and whether that race is foggy.
+def texture_pairs(races):
+    pairs = {}
+    for index, race in enumerate(races):
+        pairs.setdefault((race.floor_texture_path, race.bg_texture_path), (index, race.is_foggy))
+    return [(floor, bg, index, is_foggy) for (floor, bg), (index, is_foggy) in pairs.items()]
+
+# Renders the passed camera path with the passed renderer.
+# Returns the time (in seconds) of every frame (update and draw).
+def render_path(mode7, path):
+    camera = types.SimpleNamespace(position = numpy.zeros(2), angle = 0.0, camera_distance = CAM_DISTANCE)
+    frame_times = numpy.zeros(len(path))
+    for frame, (x, y, angle) in enumerate(path):
+        camera.position = numpy.array([x, y])
+        camera.angle = angle
+
+        start = time.perf_counter()
+        mode7.update(camera)
+        mode7.draw()
+        frame_times[frame] = time.perf_counter() - start
+    return frame_times
+
+# Benchmarks a single renderer variant with a single thread count on the passed textures.
+# Returns the result as a dict (one entry of the results in the JSON file).
+def benchmark_variant(app, race, floor_tex_path, bg_tex_path, is_foggy, variant, threads, num_frames, warmup_frames):
+    mode7 = Mode7(
+        app = app,
+        floor_tex_path = floor_tex_path,
+        bg_tex_path = bg_tex_path,
+        is_foggy = is_foggy,
+        floor_sampler = variant["sampler"],
+        pixel_format = variant["format"],
+        texture_layout = variant["layout"],
+        mipmapped = variant["mipmapped"],
+        partition = variant["partition"],
+        threads = threads
+    )
+    path = camera_path(race, num_frames)
+
+    # The first frame compiles the kernel for the types of this variant (if not compiled yet),
+    # the following frames warm up the caches and the thread pool.
+    start = time.perf_counter()
+    render_path(mode7, path[:1])
+    first_frame_time = time.perf_counter() - start
+    render_path(mode7, path[:warmup_frames])
+
+    frame_times = render_path(mode7, path)
+    total_time = frame_times.sum()
+    pixels_per_frame = mode7.render_res[0] * mode7.render_res[1]
+
+    result = {
+        "floor": floor_tex_path,
+        "background": bg_tex_path,
+        "threads": threads,
+        "first_frame_ms": first_frame_time * 1000,
+        "frames": num_frames,
+        "fps": num_frames / total_time,
+        "ms_mean": total_time / num_frames * 1000,
+        "pixels_per_second": pixels_per_frame * num_frames / total_time
+    }
+    result.update(variant)
+    for percentile, value in zip([50, 95, 99], numpy.percentile(frame_times * 1000, [50, 95, 99])):
+        result["ms_p" + str(percentile)] = value
+    return result
+
+# Adds the speedup over rendering with 1 thread to every passed result
+# (the frame rate divided by that of the same variant on the same textures with 1 thread, None if that was not measured).
+def add_speedups(results):
+    def key(result):
+        return tuple(value for name, value in result.items() if name in ["floor", "sampler", "format", "layout", "mipmapped", "partition"])
+
+    single_thread_fps = {key(result): result["fps"] for result in results if result["threads"] == 1}
+    for result in results:
+        fps = single_thread_fps.get(key(result))
+        result["speedup"] = result["fps"] / fps if fps is not None else None
+
+# Returns information about the machine and the code that the benchmark ran with.
+def environment_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "numba": numba.__version__,
+        "pygame": pygame.version.ver,
+        "numba_threading_layer": numba.config.THREADING_LAYER,
+        "max_threads": numba.config.NUMBA_NUM_THREADS,
+        "resolution": list(WIN_RES)
+    }
+
+# Parses a comma-separated list of the passed type on the command line.
+def parse_list(item_type, choices = None):
+    def parse(text):
+        items = [item_type(item) for item in text.split(",")]
+        for item in items:
+            if choices is not None and item not in choices:
+                raise argparse.ArgumentTypeError("invalid choice " + repr(item) + " (choose from " + ", ".join(map(str, choices)) + ")")
+        return items
+    return parse
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmarks the Mode7 renderer on the textures of all league races.")
+    parser.add_argument("output", help = "JSON file that the results are written to")
+    parser.add_argument("--samplers", type = parse_list(str, FLOOR_SAMPLERS), default = FLOOR_SAMPLERS, help = "floor samplers (comma-separated)")
+    parser.add_argument("--formats", type = parse_list(str, PIXEL_FORMATS), default = PIXEL_FORMATS, help = "pixel formats (comma-separated)")
+    parser.add_argument("--layouts", type = parse_list(str, TEXTURE_LAYOUTS), default = TEXTURE_LAYOUTS, help = "texture layouts (comma-separated)")
+    parser.add_argument("--mipmapped", type = parse_list(int, [0, 1]), default = [0, 1], help = "0: without, 1: with mipmapping (comma-separated)")
+    parser.add_argument("--partitions", type = parse_list(str, RENDER_PARTITIONS), default = RENDER_PARTITIONS, help = "render partitions (comma-separated)")
+    parser.add_argument("--threads", type = parse_list(int), default = list(range(1, numba.config.NUMBA_NUM_THREADS + 1)),
+        help = "numba thread counts (comma-separated, at most " + str(numba.config.NUMBA_NUM_THREADS) + ", default: all from 1)")
+    parser.add_argument("--races", type = parse_list(int), default = None, help = "indices of the races in LEAGUE_1_RACES (default: all)")
+    parser.add_argument("--frames", type = int, default = BENCHMARK_FRAMES, help = "measured frames per combination")
+    parser.add_argument("--warmup-frames", type = int, default = BENCHMARK_WARMUP_FRAMES, help = "frames rendered before measuring")
+    args = parser.parse_args()
+
+    for threads in args.threads:
+        if not 1 <= threads <= numba.config.NUMBA_NUM_THREADS:
+            parser.error("thread counts must be between 1 and " + str(numba.config.NUMBA_NUM_THREADS))
+
+    pygame.init()
+    app = types.SimpleNamespace(screen = pygame.display.set_mode(WIN_RES))
+
+    races = LEAGUE_1_RACES if args.races is None else [LEAGUE_1_RACES[index] for index in args.races]
+    variants = [
+        {"sampler": sampler, "format": pixel_format, "layout": layout, "mipmapped": bool(mipmapped), "partition": partition}
+        for sampler, pixel_format, layout, mipmapped, partition
+        in itertools.product(args.samplers, args.formats, args.layouts, args.mipmapped, args.partitions)
+    ]
+
+    results = []
+    for floor_tex_path, bg_tex_path, race_index, is_foggy in texture_pairs(races):
+        for variant, threads in itertools.product(variants, args.threads):
+            result = benchmark_variant(app, races[race_index], floor_tex_path, bg_tex_path, is_foggy, variant, threads,
+                args.frames, args.warmup_frames)
+            results.append(result)
+            print(floor_tex_path.ljust(36), variant["sampler"].ljust(10), variant["format"].ljust(7), variant["layout"].ljust(7),
+                ("mip" if variant["mipmapped"] else "no mip").ljust(7), variant["partition"].ljust(14), str(threads).rjust(2) + " threads",
+                format(result["fps"], "8.1f") + " fps", format(result["ms_p50"], "7.3f") + " ms p50",
+                format(result["ms_p99"], "7.3f") + " ms p99", format(result["pixels_per_second"] / 1e6, "7.1f") + " Mpx/s")
+
+    add_speedups(results)
+    if len(args.threads) > 1:
+        print("thread scaling (speedup over 1 thread, averaged over the textures):")
+        for variant in variants:
+            for threads in args.threads:
+                speedups = [result["speedup"] for result in results
+                    if result["threads"] == threads and result["speedup"] is not None and all(result[name] == value for name, value in variant.items())]
+                if speedups:
+                    print("  " + " ".join(str(value) for value in variant.values()).ljust(48), str(threads).rjust(2) + " threads",
+                        format(numpy.mean(speedups), "5.2f") + "x")
+
+    with open(args.output, "w") as file:
+        json.dump({"environment": environment_info(), "frames": args.frames, "results": results}, file, indent = 4)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# Module for the billboard layer of the Mode7 scene.
+#
+# Billboards are 2D sprites (obstacles, signs, other machines, ...) standing on the floor at world positions.
+# They always face the camera and are scaled by their distance to the camera.
+# The positions of all billboards are kept in arrays
+# so that all of them are projected onto the screen at once (see Mode7.project).
+
+import numpy
+import pygame
+
+from settings.renderer_settings import BILLBOARD_SCALE_STEPS, BILLBOARD_CACHE_SIZE
+
+class BillboardLayer:
+    def __init__(self):
+        # images of the billboards (indexed by image id, several billboards can share an image)
+        self.images = []
+        self.image_sizes = numpy.zeros((0, 2))
+
+        # per billboard: position on the floor, image id, anchor offset and visibility flag
+        self.positions = numpy.zeros((0, 2))
+        self.image_ids = numpy.zeros(0, dtype = numpy.int64)
+        self.anchor_offsets = numpy.zeros((0, 2))
+        self.visible = numpy.zeros(0, dtype = numpy.bool_)
+
+        # scaled versions of the images, keyed by image id and size bucket (see scaled_image)
+        self.scaled_images = {}
+
+    # Returns the number of billboards in this layer.
+    def length(self):
+        return len(self.positions)
+
+    # Adds a billboard to this layer and returns its index.
+    #
+    # Parameters:
+    # position - position (x, y) of the billboard on the floor
+    # image - image of the billboard (pygame.Surface)
+    # anchor_offset - offset (in pixels of the unscaled image) of the bottom center of the image
+    #   from the point the billboard is standing on (0, 0: the image stands on the point)
+    def add(self, position, image, anchor_offset = (0, 0)):
+        # share the image id with billboards using the same image
+        for image_id, other_image in enumerate(self.images):
+            if other_image is image:
+                break
+        else:
+            image_id = len(self.images)
+            self.images.append(image)
+            self.image_sizes = numpy.vstack([self.image_sizes, image.get_size()])
+
+        self.positions = numpy.vstack([self.positions, numpy.asarray(position, dtype = numpy.float64).reshape(1, 2)])
+        self.image_ids = numpy.append(self.image_ids, image_id)
+        self.anchor_offsets = numpy.vstack([self.anchor_offsets, numpy.asarray(anchor_offset, dtype = numpy.float64).reshape(1, 2)])
+        self.visible = numpy.append(self.visible, True)
+        return self.length() - 1
+
+    # Moves the billboard with the passed index to the passed position.
+    def move(self, index, position):
+        self.positions[index] = position
+
+    # Shows or hides the billboard with the passed index.
+    def set_visible(self, index, visible):
+        self.visible[index] = visible
+
+    # Returns the image with the passed id scaled by the passed factor.
+    # The scale factor is rounded to one of BILLBOARD_SCALE_STEPS steps per unit
+    # and the scaled images are cached per step,
+    # so billboards at similar distances share the same scaled image.
+    def scaled_image(self, image_id, scale):
+        bucket = max(1, round(scale * BILLBOARD_SCALE_STEPS))
+        key = (image_id, bucket)
+
+        scaled = self.scaled_images.get(key)
+        if scaled is None:
+            # keep the memory bounded (cached images are cheap to recreate)
+            if len(self.scaled_images) >= BILLBOARD_CACHE_SIZE:
+                self.scaled_images.clear()
+
+            image = self.images[image_id]
+            bucket_scale = bucket / BILLBOARD_SCALE_STEPS
+            size = (max(1, round(image.get_width() * bucket_scale)), max(1, round(image.get_height() * bucket_scale)))
+            scaled = pygame.transform.scale(image, size)
+            self.scaled_images[key] = scaled
+        return scaled
+
+    # Draws all visible billboards onto the passed screen,
+    # projected with the passed Mode7 renderer as seen from the passed camera.
+    # Billboards are drawn back to front, billboards outside of the view are skipped.
+    def draw(self, screen, mode7, camera):
+        if self.length() == 0:
+            return
+
+        screen_x, screen_y, scale, in_front = mode7.project(camera, self.positions)
+
+        # sizes and top left corners of the scaled images
+        base_sizes = self.image_sizes[self.image_ids]
+        widths = base_sizes[:, 0] * scale
+        heights = base_sizes[:, 1] * scale
+        lefts = screen_x + self.anchor_offsets[:, 0] * scale - widths / 2
+        tops = screen_y + self.anchor_offsets[:, 1] * scale - heights
+
+        # Culling: billboards behind the camera, outside of the screen,
+        # too close to the camera (larger than the screen) or too far away (smaller than a pixel) are not drawn.
+        screen_width, screen_height = screen.get_size()
+        drawn = (self.visible & in_front
+            & (lefts + widths > 0) & (lefts < screen_width)
+            & (tops + heights > 0) & (tops < screen_height)
+            & (widths <= screen_width) & (heights <= screen_height)
+            & (heights >= 1))
+        indices = numpy.nonzero(drawn)[0]
+
+        # back to front: billboards further away (smaller scale) first
+        indices = indices[numpy.argsort(scale[indices], kind = "stable")]
+
+        screen.blits([
+            (self.scaled_image(self.image_ids[index], scale[index]), (round(lefts[index]), round(tops[index])))
+            for index in indices
+        ], doreturn = False)
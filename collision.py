@@ -3,6 +3,19 @@
 # since the shapes are not within screen space but within some custom logical 3D-space
 # that pygame is not aware of.
 
+import math
+import numpy
+import hashlib
+import zipfile
+
+# JIT compiler for the batch collision queries
+from numba import njit
+
+from kernel_cache import JIT_CACHE
+from files import write_file_atomically
+
+from settings.collision_settings import MAX_GRID_CELLS_PER_AXIS, GRID_CELLS_PER_RECT, GRID_MIN_RECTS
+
 # A class modelling a rectangular collider around a game object.
 # A numpy list is used to model the colliders position.
 class CollisionRect:
@@ -22,4 +35,340 @@ class CollisionRect:
 
 
     def __str__(self):
-        return "(" + str(self.position[0]) + ", " + str(self.position[1]) + "), " + str(self.width) + ", " + str(self.height)
\ No newline at end of file
+        return "(" + str(self.position[0]) + ", " + str(self.position[1]) + "), " + str(self.width) + ", " + str(self.height)
+
+
+
+# A set of rectangle colliders stored as struct of arrays:
+# the centers and half extents (half width, half height) of all rects 
+# are kept in contiguous float arrays instead of one Python object per rect.
+#
+# Supports testing a single collider against all rects (using a uniform grid, see CollisionGrid)
+# as well as testing many positions against all rects in a single compiled call.
+# The overlap test is the same as CollisionRect.overlap,
+# so the results are exactly the same as when testing the rects one by one.
+class CollisionRectSet:
+    def __init__(self, rects):
+        # the rect objects the set was created from
+        self.rects = rects
+
+        # (number of rects) x 2 arrays of the centers and half extents
+        self.centers = numpy.array([[rect.position[0], rect.position[1]] for rect in rects], dtype = numpy.float64).reshape(-1, 2)
+        self.half_extents = numpy.array([[rect.width / 2, rect.height / 2] for rect in rects], dtype = numpy.float64).reshape(-1, 2)
+
+        # Plain Python copy of the arrays above for single queries
+        # (indexing numpy arrays element by element is slow compared to Python lists).
+        self.rect_tuples = [tuple(center) + tuple(half_extent) for center, half_extent in zip(self.centers.tolist(), self.half_extents.tolist())]
+
+        # spatial index so that single queries only test the rects near the collider
+        self.grid = CollisionGrid(self.centers, self.half_extents)
+
+    # Returns the number of rects in this set.
+    def length(self):
+        return len(self.rect_tuples)
+
+    # Returns the indices of all rects in this set that overlap with the passed rectangular collider.
+    #
+    # Parameters:
+    # other (CollisionRect)
+    def overlapping_indices(self, other):
+        x, y = float(other.position[0]), float(other.position[1])
+        half_width, half_height = other.width / 2, other.height / 2
+
+        indices = set()
+        for index in self.grid.candidates(x - half_width, x + half_width, y - half_height, y + half_height):
+            center_x, center_y, rect_half_width, rect_half_height = self.rect_tuples[index]
+            if abs(center_x - x) <= rect_half_width + half_width and abs(center_y - y) <= rect_half_height + half_height:
+                indices.add(index)
+        return sorted(indices)
+
+    # Determines whether the passed rectangular collider collides with any of the rects in this set.
+    #
+    # Parameters:
+    # other (CollisionRect)
+    def collides(self, other):
+        x, y = float(other.position[0]), float(other.position[1])
+        half_width, half_height = other.width / 2, other.height / 2
+
+        for index in self.grid.candidates(x - half_width, x + half_width, y - half_height, y + half_height):
+            center_x, center_y, rect_half_width, rect_half_height = self.rect_tuples[index]
+            if abs(center_x - x) <= rect_half_width + half_width and abs(center_y - y) <= rect_half_height + half_height:
+                return True
+        return False
+
+    # Determines for each of the passed positions whether a collider of the passed size
+    # centered at that position collides with any of the rects in this set.
+    #
+    # Parameters:
+    # positions - (number of positions) x 2 array of collider centers
+    # width, height - size of the colliders (the same for all positions)
+    #
+    # Returns a boolean array with one entry per position.
+    def collides_batch(self, positions, width, height):
+        positions = numpy.ascontiguousarray(positions, dtype = numpy.float64).reshape(-1, 2)
+        result = numpy.zeros(len(positions), dtype = numpy.bool_)
+        return overlap_any_batch(self.centers, self.half_extents, positions, width / 2, height / 2, result)
+
+    # Determines for each of the passed positions and each rect in this set whether a collider of the passed size
+    # centered at that position overlaps with that rect.
+    # Parameters as for collides_batch.
+    #
+    # Returns a boolean array of shape (number of positions) x (number of rects).
+    def overlap_matrix(self, positions, width, height):
+        positions = numpy.ascontiguousarray(positions, dtype = numpy.float64).reshape(-1, 2)
+        result = numpy.zeros((len(positions), len(self.centers)), dtype = numpy.bool_)
+        return overlap_matrix_batch(self.centers, self.half_extents, positions, width / 2, height / 2, result)
+
+
+
+# Tests every passed position against all passed rects (given as centers and half extents).
+# An entry of the result array is set to True if the collider at the respective position
+# (with the passed half extents) overlaps with at least one rect.
+#
+# No fastmath here since the results have to match CollisionRect.overlap exactly.
+@njit(cache = JIT_CACHE)
+def overlap_any_batch(centers, half_extents, positions, half_width, half_height, result):
+    for n in range(positions.shape[0]):
+        for m in range(centers.shape[0]):
+            if (abs(centers[m, 0] - positions[n, 0]) <= half_extents[m, 0] + half_width 
+                    and abs(centers[m, 1] - positions[n, 1]) <= half_extents[m, 1] + half_height):
+                result[n] = True
+                break
+    return result
+
+
+
+# Like overlap_any_batch, but sets an entry of the result matrix for every pair of position and rect that overlap.
+@njit(cache = JIT_CACHE)
+def overlap_matrix_batch(centers, half_extents, positions, half_width, half_height, result):
+    for n in range(positions.shape[0]):
+        for m in range(centers.shape[0]):
+            result[n, m] = (abs(centers[m, 0] - positions[n, 0]) <= half_extents[m, 0] + half_width 
+                and abs(centers[m, 1] - positions[n, 1]) <= half_extents[m, 1] + half_height)
+    return result
+
+
+
+# A spatial index for a set of rects (given as centers and half extents):
+# the bounding box of all rects is divided into a uniform grid
+# and every cell stores the indices of the rects that (might) overlap with it.
+#
+# To find the rects that a collider might collide with,
+# only the rects stored in the cells overlapped by the collider need to be considered.
+# The actual overlap test is up to the user of the grid.
+class CollisionGrid:
+    def __init__(self, centers, half_extents):
+        self.num_rects = len(centers)
+
+        # no grid needed for few rects (see candidates)
+        if self.num_rects <= GRID_MIN_RECTS:
+            return
+
+        # bounding box of all rects
+        self.min_x = float(numpy.min(centers[:, 0] - half_extents[:, 0]))
+        self.max_x = float(numpy.max(centers[:, 0] + half_extents[:, 0]))
+        self.min_y = float(numpy.min(centers[:, 1] - half_extents[:, 1]))
+        self.max_y = float(numpy.max(centers[:, 1] + half_extents[:, 1]))
+
+        # More rects -> finer grid.
+        # Cells have at least a tiny size so that degenerated bounding boxes do not cause divisions by 0.
+        self.num_cells = min(max(1, GRID_CELLS_PER_RECT * math.ceil(math.sqrt(self.num_rects))), MAX_GRID_CELLS_PER_AXIS)
+        self.cell_width = max((self.max_x - self.min_x) / self.num_cells, 1e-9)
+        self.cell_height = max((self.max_y - self.min_y) / self.num_cells, 1e-9)
+
+        # Cells are stored row by row in a flat list.
+        # Every rect is inserted into all cells overlapped by its bounding box.
+        # The bounding box is enlarged by a tiny margin 
+        # so that rounding errors can never make a rect miss a cell that the overlap test would accept
+        # (testing a few rects too many is harmless).
+        self.cells = [[] for _ in range(self.num_cells * self.num_cells)]
+        for index, ((center_x, center_y), (half_width, half_height)) in enumerate(zip(centers.tolist(), half_extents.tolist())):
+            margin = 1e-9 * (abs(center_x) + abs(center_y) + half_width + half_height)
+            for cell in self.cells_in_box(
+                center_x - half_width - margin, center_x + half_width + margin,
+                center_y - half_height - margin, center_y + half_height + margin
+            ):
+                cell.append(index)
+
+    # Returns the list of cells that are overlapped by the box with the passed borders.
+    def cells_in_box(self, left, right, bottom, top):
+        # box does not overlap with the grid at all
+        if right < self.min_x or left > self.max_x or top < self.min_y or bottom > self.max_y:
+            return []
+
+        first_column, last_column = self.cell_index(left, self.min_x, self.cell_width), self.cell_index(right, self.min_x, self.cell_width)
+        first_row, last_row = self.cell_index(bottom, self.min_y, self.cell_height), self.cell_index(top, self.min_y, self.cell_height)
+
+        return [
+            self.cells[row * self.num_cells + column]
+            for row in range(first_row, last_row + 1)
+            for column in range(first_column, last_column + 1)
+        ]
+
+    # Returns the index of the grid column/row that the passed coordinate lies in
+    # (clamped to the grid).
+    def cell_index(self, coord, grid_min, cell_size):
+        return min(max(int(math.floor((coord - grid_min) / cell_size)), 0), self.num_cells - 1)
+
+    # Returns the indices of the rects that might overlap with the box with the passed borders
+    # (may contain an index several times if the rect is stored in several cells).
+    def candidates(self, left, right, bottom, top):
+        # Few rects: testing all of them is faster than looking up the cells.
+        if self.num_rects <= GRID_MIN_RECTS:
+            return range(self.num_rects)
+
+        return [index for cell in self.cells_in_box(left, right, bottom, top) for index in cell]
+
+
+
+# bit that is set in the cells of a collision raster whose flags are ambiguous (see CollisionRaster)
+RASTER_EDGE_FLAG = 128
+
+# A collision raster bakes several sets of rects into a 2D uint8 array at a fixed resolution.
+# Every set of rects is assigned a bit (its flag), 
+# and every cell of the raster holds the flags of the sets that a collider centered in the cell collides with.
+# Querying all flags for a position then takes a single array lookup.
+#
+# The raster is baked for a fixed collider size:
+# the rects are enlarged by half the collider size (so that testing the collider's center against the enlarged rect
+# is the same as testing the collider against the rect).
+# Cells that are only partially covered by an enlarged rect (i.e. cells at the rect borders)
+# are marked with RASTER_EDGE_FLAG instead, 
+# the flags of positions in these cells have to be determined by testing the rects.
+# This way, the raster gives exactly the same results as testing the rects.
+class CollisionRaster:
+    # Parameters:
+    # flags - 2D uint8 array of the cell flags (indexed by x, then y cell index)
+    # origin_x, origin_y - coordinates of the corner of the cell (0, 0)
+    # cells_per_unit - resolution of the raster
+    # collider_width, collider_height - size of the collider the raster was baked for
+    def __init__(self, flags, origin_x, origin_y, cells_per_unit, collider_width, collider_height):
+        self.flags = flags
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.cells_per_unit = cells_per_unit
+        self.collider_width = collider_width
+        self.collider_height = collider_height
+
+    # Returns the flags of the passed position.
+    # Positions outside the raster do not collide with any rect.
+    # If RASTER_EDGE_FLAG is set, the other flags are meaningless
+    # and the rects have to be tested instead.
+    def lookup(self, x, y):
+        i = int(math.floor((x - self.origin_x) * self.cells_per_unit))
+        j = int(math.floor((y - self.origin_y) * self.cells_per_unit))
+        if i < 0 or j < 0 or i >= self.flags.shape[0] or j >= self.flags.shape[1]:
+            return 0
+        return int(self.flags[i, j])
+
+    # Determines whether this raster can answer queries for the passed collider
+    # (it was baked for colliders of the same size).
+    def supports(self, collider):
+        return collider.width == self.collider_width and collider.height == self.collider_height
+
+    # Bakes a collision raster.
+    #
+    # Parameters:
+    # rect_sets - list of pairs (CollisionRectSet, flag)
+    # collider_width, collider_height - size of the collider that the raster is baked for
+    # cells_per_unit - (maximum) resolution of the raster
+    # max_cells - upper limit for the number of cells, the resolution is lowered if it would be exceeded
+    @staticmethod
+    def bake(rect_sets, collider_width, collider_height, cells_per_unit, max_cells):
+        # enlarged rects (see class comment) of all sets
+        half_collider = numpy.array([collider_width / 2, collider_height / 2])
+        enlarged = [(rect_set.centers, rect_set.half_extents + half_collider, flag) for rect_set, flag in rect_sets]
+
+        # the raster covers the bounding box of all enlarged rects
+        all_mins = [centers - half_extents for centers, half_extents, _ in enlarged if len(centers) > 0]
+        all_maxs = [centers + half_extents for centers, half_extents, _ in enlarged if len(centers) > 0]
+        if len(all_mins) == 0:
+            return CollisionRaster(numpy.zeros((1, 1), dtype = numpy.uint8), 0.0, 0.0, 1.0, collider_width, collider_height)
+        origin_x, origin_y = numpy.min(numpy.concatenate(all_mins), axis = 0)
+        max_x, max_y = numpy.max(numpy.concatenate(all_maxs), axis = 0)
+
+        # lower resolution if the raster would become too large
+        area = max((max_x - origin_x) * (max_y - origin_y), 1e-9)
+        cells_per_unit = min(cells_per_unit, math.sqrt(max_cells / area))
+
+        num_cells_x = int(math.ceil((max_x - origin_x) * cells_per_unit)) + 1
+        num_cells_y = int(math.ceil((max_y - origin_y) * cells_per_unit)) + 1
+        flags = numpy.zeros((num_cells_x, num_cells_y), dtype = numpy.uint8)
+        edge = numpy.zeros((num_cells_x, num_cells_y), dtype = numpy.bool_)
+
+        # Safety margin against rounding errors:
+        # cells closer than this to a rect border are always treated as edge cells.
+        margin = 1e-6 * (1 + max(abs(origin_x), abs(origin_y), abs(max_x), abs(max_y)))
+
+        for centers, half_extents, flag in enlarged:
+            inside = numpy.zeros((num_cells_x, num_cells_y), dtype = numpy.bool_)
+            touched = numpy.zeros((num_cells_x, num_cells_y), dtype = numpy.bool_)
+
+            for (center_x, center_y), (half_width, half_height) in zip(centers.tolist(), half_extents.tolist()):
+                # cells (i.e. closed squares [i / c, (i + 1) / c] relative to the origin) that touch the rect
+                first_x, last_x = CollisionRaster.cell_range(center_x - half_width - margin, center_x + half_width + margin, origin_x, cells_per_unit)
+                first_y, last_y = CollisionRaster.cell_range(center_y - half_height - margin, center_y + half_height + margin, origin_y, cells_per_unit)
+                touched[first_x:last_x + 1, first_y:last_y + 1] = True
+
+                # cells that lie completely inside the rect
+                first_x = int(math.ceil((center_x - half_width + margin - origin_x) * cells_per_unit))
+                last_x = int(math.floor((center_x + half_width - margin - origin_x) * cells_per_unit)) - 1
+                first_y = int(math.ceil((center_y - half_height + margin - origin_y) * cells_per_unit))
+                last_y = int(math.floor((center_y + half_height - margin - origin_y) * cells_per_unit)) - 1
+                if first_x <= last_x and first_y <= last_y:
+                    inside[max(first_x, 0):last_x + 1, max(first_y, 0):last_y + 1] = True
+
+            flags[inside] |= flag
+            edge |= touched & ~inside
+
+        flags[edge] |= RASTER_EDGE_FLAG
+
+        return CollisionRaster(flags, float(origin_x), float(origin_y), float(cells_per_unit), collider_width, collider_height)
+
+    # Returns the first and last index of the cells touched by the interval [low, high].
+    @staticmethod
+    def cell_range(low, high, origin, cells_per_unit):
+        return max(int(math.floor((low - origin) * cells_per_unit)), 0), int(math.floor((high - origin) * cells_per_unit))
+
+    # Computes a key identifying the raster that bake would create for the passed parameters.
+    # Used to detect whether a raster cached on disk is outdated.
+    @staticmethod
+    def bake_key(rect_sets, collider_width, collider_height, cells_per_unit, max_cells):
+        key = hashlib.sha1()
+        for rect_set, flag in rect_sets:
+            key.update(str(flag).encode())
+            key.update(rect_set.centers.tobytes())
+            key.update(rect_set.half_extents.tobytes())
+        key.update(repr((collider_width, collider_height, cells_per_unit, max_cells)).encode())
+        return key.hexdigest()
+
+    # Returns the raster cached in the file under the passed path
+    # if it was baked for the passed parameters (see bake).
+    # Otherwise, the raster is baked and stored in that file.
+    @staticmethod
+    def load_or_bake(path, rect_sets, collider_width, collider_height, cells_per_unit, max_cells):
+        key = CollisionRaster.bake_key(rect_sets, collider_width, collider_height, cells_per_unit, max_cells)
+
+        try:
+            with numpy.load(path) as cached:
+                if str(cached["key"]) == key:
+                    origin_x, origin_y, cached_cells_per_unit = cached["params"].tolist()
+                    return CollisionRaster(cached["flags"], origin_x, origin_y, cached_cells_per_unit, collider_width, collider_height)
+        except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+            pass # no (valid) cache file yet, or a corrupt one (it is replaced below)
+
+        raster = CollisionRaster.bake(rect_sets, collider_width, collider_height, cells_per_unit, max_cells)
+
+        # Failing to write the cache file (e.g. read-only installation) is not an error,
+        # the raster is just baked again next time.
+        try:
+            write_file_atomically(path, lambda cache_file: numpy.savez_compressed(
+                cache_file, 
+                key = numpy.array(key), 
+                flags = raster.flags, 
+                params = numpy.array([raster.origin_x, raster.origin_y, raster.cells_per_unit])
+            ))
+        except OSError:
+            pass
+
+        return raster
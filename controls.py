@@ -0,0 +1,33 @@
+# Module for the inputs that control a machine in a race.
+#
+# Decouples the physics of the player (see Player.racing_mode_movement) from the keyboard,
+# so that the same physics can be driven by recorded inputs, AI policies, ...
+
+import pygame
+
+from settings.key_settings import STD_ACCEL_KEY, STD_LEFT_KEY, STD_RIGHT_KEY, STD_BRAKE_KEY, STD_BOOST_KEY # button mapping config
+
+# The state of all racing controls in a single frame.
+class InputState:
+    def __init__(self, accelerate = False, brake = False, boost = False, left = False, right = False):
+        self.accelerate = accelerate
+        self.brake = brake
+        self.boost = boost
+        self.left = left
+        self.right = right
+
+    # Returns the input state according to the keys currently pressed on the keyboard
+    # (using the standard button mapping).
+    @staticmethod
+    def from_keyboard():
+        keys = pygame.key.get_pressed()
+        return InputState(
+            accelerate = keys[STD_ACCEL_KEY],
+            brake = keys[STD_BRAKE_KEY],
+            boost = keys[STD_BOOST_KEY],
+            left = keys[STD_LEFT_KEY],
+            right = keys[STD_RIGHT_KEY]
+        )
+
+    def __str__(self):
+        return "accelerate: " + str(self.accelerate) + ", brake: " + str(self.brake) + ", boost: " + str(self.boost) + ", left: " + str(self.left) + ", right: " + str(self.right)
@@ -0,0 +1,84 @@
+# Module for driving policies that control machines in batch simulations (see batch_physics module).
+#
+# A policy decides the inputs of all machines of a MachineBatch in every step.
+# Policies provide two methods:
+# reset(batch) - called when the race of the batch (re-)starts
+# inputs(batch) - returns the N x NUM_INPUTS boolean input array for the next step of the batch
+
+import numpy
+
+from batch_physics import NUM_INPUTS, INPUT_ACCELERATE, INPUT_BOOST, INPUT_LEFT, INPUT_RIGHT
+from settings.simulation_settings import RACING_LINES, WAYPOINT_REACH_RADIUS, WAYPOINT_STEERING_TOLERANCE
+from settings.simulation_settings import WAYPOINT_THROTTLE_ANGLE, WAYPOINT_BOOST_ANGLE
+
+# Simple AI that drives all machines along a racing line (closed loop of waypoints).
+# Every machine steers towards its next waypoint and accelerates as long as it roughly faces that waypoint.
+# Once a machine is close enough to its waypoint, it heads for the following one.
+class WaypointPolicy:
+    # Parameters:
+    # waypoints - list of (x, y) waypoints in driving direction
+    # reach_radius - distance to a waypoint at which a machine switches to the next waypoint
+    # steering_tolerance, throttle_angle, boost_angle - see the respective settings in the simulation settings
+    def __init__(self, waypoints, reach_radius = WAYPOINT_REACH_RADIUS, steering_tolerance = WAYPOINT_STEERING_TOLERANCE,
+            throttle_angle = WAYPOINT_THROTTLE_ANGLE, boost_angle = WAYPOINT_BOOST_ANGLE):
+        self.waypoints = numpy.array(waypoints, dtype = numpy.float64)
+        self.reach_radius = reach_radius
+        self.steering_tolerance = steering_tolerance
+        self.throttle_angle = throttle_angle
+        self.boost_angle = boost_angle
+
+        # index of the waypoint each machine is currently heading for
+        self.targets = numpy.zeros(0, dtype = numpy.int64)
+
+    # Creates the waypoint policy for the racing line of the passed race's track (see RACING_LINES).
+    # Raises a ValueError if there is no racing line for the track.
+    @staticmethod
+    def for_race(race):
+        track_name = race.race_track.name
+        if track_name not in RACING_LINES:
+            raise ValueError("no racing line for track " + repr(track_name) + " (see RACING_LINES in the simulation settings)")
+        return WaypointPolicy(RACING_LINES[track_name])
+
+    def reset(self, batch):
+        self.targets = numpy.zeros(batch.size, dtype = numpy.int64)
+
+    def inputs(self, batch):
+        # switch to the next waypoint if the current one is reached
+        offsets = self.waypoints[self.targets] - batch.position
+        reached = numpy.hypot(offsets[:, 0], offsets[:, 1]) < self.reach_radius
+        self.targets[reached] = (self.targets[reached] + 1) % len(self.waypoints)
+
+        # signed angle between the machine's direction and the direction to its waypoint (in [-pi, pi))
+        offsets = self.waypoints[self.targets] - batch.position
+        heading = numpy.arctan2(offsets[:, 1], offsets[:, 0])
+        angle_error = (heading - batch.angle + numpy.pi) % (2 * numpy.pi) - numpy.pi
+
+        # steering left increases the angle of a machine, steering right decreases it
+        inputs = numpy.zeros((batch.size, NUM_INPUTS), dtype = numpy.bool_)
+        inputs[:, INPUT_LEFT] = angle_error > self.steering_tolerance
+        inputs[:, INPUT_RIGHT] = angle_error < -self.steering_tolerance
+        inputs[:, INPUT_ACCELERATE] = numpy.abs(angle_error) < self.throttle_angle
+        inputs[:, INPUT_BOOST] = numpy.abs(angle_error) < self.boost_angle
+        return inputs
+
+# Drives all machines with the same fixed sequence of inputs (e.g. recorded from a human player).
+# After the end of the sequence, its last inputs are held.
+class ScriptedPolicy:
+    # Parameters:
+    # input_sequence - T x NUM_INPUTS boolean array with the inputs of each step
+    def __init__(self, input_sequence):
+        self.input_sequence = numpy.asarray(input_sequence, dtype = numpy.bool_).reshape(-1, NUM_INPUTS)
+        self.current_step = 0
+
+    # Loads the input sequence from the .npy file under the passed path.
+    @staticmethod
+    def load(path):
+        return ScriptedPolicy(numpy.load(path))
+
+    def reset(self, batch):
+        self.current_step = 0
+
+    def inputs(self, batch):
+        step = min(self.current_step, len(self.input_sequence) - 1)
+        self.current_step += 1
+        return numpy.tile(self.input_sequence[step], (batch.size, 1))
@@ -0,0 +1,25 @@
+# Module for writing the files that the game and its tools create (caches, ghosts, results).
+
+import os
+import threading
+
+# Writes a file under the passed path by calling the passed function with the opened (binary) file.
+#
+# The contents are written to a temporary file next to the target first, which then replaces the target,
+# so an interrupted write never leaves a truncated file behind
+# and readers only ever see the old or the new file.
+# Several threads or processes may write the same file at once (e.g. the preloader and sweep workers baking a raster),
+# so each of them writes its own temporary file.
+# If writing fails, the temporary file is removed and the error is raised.
+def write_file_atomically(path, write):
+    temporary_path = path + "." + str(os.getpid()) + "-" + str(threading.get_ident()) + ".tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            write(file)
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
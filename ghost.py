@@ -0,0 +1,135 @@
+# Module for the ghost machine of time-attack races.
+#
+# While racing, the position and angle of the player are sampled in every frame.
+# Whenever the player completes a lap faster than the best lap so far,
+# the samples of that lap are saved as the new ghost trajectory of the race.
+# In every lap, a semi-transparent ghost machine drives the best lap alongside the player
+# (drawn as a billboard, see billboard module).
+
+import os
+import numpy
+import pygame
+
+from files import write_file_atomically
+
+from settings.renderer_settings import HALF_WIDTH, NORMAL_ON_SCREEN_PLAYER_POSITION_X, NORMAL_ON_SCREEN_PLAYER_POSITION_Y
+from settings.ghost_settings import GHOST_DIRECTORY, GHOST_ALPHA
+
+# The samples of a lap: time since lap start, x and y position and angle of the machine in every frame.
+# Stored as a 4 x T float32 array (one row per quantity)
+# so that the time row is contiguous and can be binary-searched without reading the other rows.
+class GhostTrajectory:
+    def __init__(self, samples):
+        self.samples = samples
+
+    # Loads the trajectory from the .npy file under the passed path.
+    # The file is read completely (a lap is only a few KB):
+    # a memory-mapped file could not be replaced by save on every platform while the mapping is alive (e.g. on Windows).
+    @staticmethod
+    def load(path):
+        return GhostTrajectory(numpy.load(path))
+
+    # Writes the trajectory to the .npy file under the passed path.
+    def save(self, path):
+        write_file_atomically(path, lambda file: numpy.save(file, self.samples))
+
+    # Returns the duration of the lap (in seconds).
+    def duration(self):
+        return float(self.samples[0, -1])
+
+    # Returns the position (x, y) and angle of the machine at the passed time since lap start,
+    # linearly interpolated between the two samples around that time.
+    def sample(self, time):
+        times = self.samples[0]
+        k = int(numpy.searchsorted(times, time, side = "right"))
+
+        # clamp to the first and last sample
+        if k <= 0:
+            return self.samples[1:, 0].astype(numpy.float64)
+        if k >= times.shape[0]:
+            return self.samples[1:, -1].astype(numpy.float64)
+
+        before = self.samples[:, k - 1].astype(numpy.float64)
+        after = self.samples[:, k].astype(numpy.float64)
+        weight = (time - before[0]) / (after[0] - before[0]) if after[0] > before[0] else 0.0
+        return before[1:] + (after[1:] - before[1:]) * weight
+
+# Records the laps of the player in a race and moves the ghost of the best lap.
+class Ghost:
+    # Parameters:
+    # race - the race that the ghost belongs to
+    # image - image of the ghost machine (usually a frame of the player's machine)
+    # billboards - billboard layer that the ghost is drawn in
+    # mode7 - renderer of the race
+    # camera - camera that follows the player
+    def __init__(self, race, image, billboards, mode7, camera):
+        self.race = race
+
+        # ghost trajectories are stored per race (named after the floor texture of the race)
+        self.path = os.path.join(
+            GHOST_DIRECTORY,
+            os.path.splitext(os.path.basename(race.floor_texture_path))[0] + ".ghost.npy"
+        )
+
+        # best lap so far (None if no lap has been completed on this race yet)
+        self.best_lap = GhostTrajectory.load(self.path) if os.path.exists(self.path) else None
+
+        # Semi-transparent version of the image.
+        # The alpha is multiplied into the pixels so that it is kept when the image is scaled.
+        self.image = image.convert_alpha()
+        self.image.fill((255, 255, 255, GHOST_ALPHA), special_flags = pygame.BLEND_RGBA_MULT)
+
+        # The ghost is drawn relative to the point it stands on
+        # as the player sprite is drawn relative to the player position
+        # (which is always straight ahead of the camera at the camera distance).
+        width, height = self.image.get_size()
+        anchor_offset = (
+            NORMAL_ON_SCREEN_PLAYER_POSITION_X + width / 2 - HALF_WIDTH,
+            NORMAL_ON_SCREEN_PLAYER_POSITION_Y + height - mode7.screen_row(camera.camera_distance)
+        )
+        self.billboards = billboards
+        self.billboard = billboards.add((0, 0), self.image, anchor_offset)
+        billboards.set_visible(self.billboard, False)
+
+        # samples of the lap that is currently driven and race time at which it started
+        self.lap_samples = []
+        self.lap_start_time = 0.0
+        self.completed_laps = race.player_completed_laps
+
+    # Records the current position and angle of the player at the passed race time (in seconds)
+    # and moves the ghost.
+    # If the player has completed a lap in this frame, the lap is saved if it is the best one so far.
+    # Called once per frame after the player has been updated.
+    def update(self, race_time, player):
+        if player.finished:
+            self.billboards.set_visible(self.billboard, False)
+            return
+
+        self.lap_samples.append((race_time - self.lap_start_time, player.position[0], player.position[1], player.angle))
+
+        if self.race.player_completed_laps > self.completed_laps:
+            self.completed_laps = self.race.player_completed_laps
+
+            lap = GhostTrajectory(numpy.array(self.lap_samples, dtype = numpy.float32).T.copy())
+            if self.best_lap is None or lap.duration() < self.best_lap.duration():
+                os.makedirs(GHOST_DIRECTORY, exist_ok = True)
+                lap.save(self.path)
+                self.best_lap = lap
+
+            # the last sample of a lap is the first sample of the next one
+            self.lap_start_time = race_time
+            self.lap_samples = [(0.0, player.position[0], player.position[1], player.angle)]
+
+        self.move(race_time)
+
+    # Moves the ghost to its position at the passed race time (in seconds).
+    # The ghost is hidden if there is no best lap yet or the best lap is already over.
+    def move(self, race_time):
+        time = race_time - self.lap_start_time
+        if self.best_lap is None or time > self.best_lap.duration():
+            self.billboards.set_visible(self.billboard, False)
+            return
+
+        x, y, angle = self.best_lap.sample(time)
+        self.billboards.move(self.billboard, (x, y))
+        self.billboards.set_visible(self.billboard, True)
@@ -0,0 +1,35 @@
+# Module for the on-disk cache of the compiled numba kernels.
+#
+# Kernels decorated with cache = JIT_CACHE are compiled on their first call as usual,
+# but the compiled code is stored in the JIT cache directory (see renderer settings),
+# so later launches of the game (and the worker processes of the tools) load it from there instead of compiling again.
+#
+# Numba only notices that a cached kernel is outdated when the source file of the kernel changes.
+# The kernels also contain the values of the settings that they use (e.g. FOCAL_LEN) as constants, though.
+# Thus, the cache is stored in a subdirectory named after a hash of the settings files:
+# after changing any setting, the kernels are compiled again.
+#
+# Must be imported before any cached kernel is defined
+# (numba reads the cache directory when a kernel is decorated).
+
+import glob
+import hashlib
+import os
+
+import numba
+
+from settings.renderer_settings import JIT_CACHE_ENABLED, JIT_CACHE_DIRECTORY
+
+# Returns a hash of the contents of all settings files.
+def settings_hash():
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings", "*.py"))):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+# value of the cache option of the kernels
+JIT_CACHE = JIT_CACHE_ENABLED
+
+if JIT_CACHE:
+    numba.config.CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), JIT_CACHE_DIRECTORY, settings_hash())
@@ -18,6 +18,13 @@ class League:
         self.current_race_index += 1
         return self.current_race()
 
+    # Returns the race that follows the current one without moving the index
+    # (None if the current race is the last one of the league).
+    def upcoming_race(self):
+        if self.current_race_index + 1 >= self.length():
+            return None
+        return self.races[self.current_race_index + 1]
+
     # Returns True if and only if the player has completed this league.
     def is_completed(self):
         return self.current_race_index >= self.length()
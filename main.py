@@ -1,7 +1,12 @@
 # foreign module imports
 import pygame, time
+
+# start of the game (the time until the first frame is displayed is measured from here, see report_startup_time)
+GAME_START_TIME = time.perf_counter()
+
 from pygame import mixer # module for playing sound
 import sys
+import os
 
 # import of the game settings
 from settings.debug_settings import *
@@ -9,9 +14,10 @@ from settings.machine_settings import *
 from settings.renderer_settings import *
 from settings.track_settings import *
 from settings.ui_settings import *
-from settings.key_settings import STD_CONFIRM_KEY, STD_DEBUG_RESTART_KEY
+from settings.key_settings import STD_CONFIRM_KEY, STD_DEBUG_RESTART_KEY, STD_PROFILER_KEY
 from settings.league_settings import *
 from settings.music_settings import *
+from settings.ghost_settings import GHOSTS_ENABLED
 
 # other imports from this project
 from mode7 import Mode7
@@ -22,6 +28,13 @@ from race import Race
 from league import League
 from settings.track_settings import TrackCreator
 from ui import UI
+from preloader import AssetPreloader
+from controls import InputState
+from replay import Replay
+from ghost import Ghost
+from billboard import BillboardLayer
+from resolution import ResolutionController
+from profiler import FrameProfiler
 
 # debug only imports
 from collision import CollisionRect
@@ -32,12 +45,20 @@ from collision import CollisionRect
 # updating the game state and 
 # handling the game's internal clock.
 class App:
-    def __init__(self):
+    # Parameters:
+    # replay - replay that is played back instead of letting the player drive (None for a normal game)
+    def __init__(self, replay = None):
         # ------------- general initialization --------------------
 
         self.screen = pygame.display.set_mode(WIN_RES)
         self.clock = pygame.time.Clock()
 
+        # shown until the first race is loaded
+        self.draw_loading_screen()
+
+        # time from the start of the game until the first frame was displayed (None before that)
+        self.startup_time = None
+
         self.in_racing_mode = False
 
         # Creates a group of sprites that contains all the sprites
@@ -54,13 +75,39 @@ class App:
         mixer.init()
         mixer.music.set_volume(MUSIC_VOLUME)
 
+        # loads the assets of the next race in the background while the current one is running
+        self.preloader = AssetPreloader()
+
+        # replay that is played back (None if the player is driving)
+        # and iterator over its remaining frames (see Replay.frames)
+        self.replay = replay
+        self.replay_frames = None
+
+        # replay of the current race that is being recorded (None if no replay is being recorded)
+        self.recording = None
+
+        # Adapts the internal resolution of the renderer to hold the target frame rate
+        # (None if the renderer always renders at the window resolution).
+        self.resolution = ResolutionController(TARGET_FPS) if DYNAMIC_RESOLUTION else None
+
+        # Start of the current frame (end of the frame rate cap of the last frame)
+        # and time spent on rendering the Mode7 environment in it (both in seconds).
+        # Used by the dynamic resolution.
+        self.frame_start = time.perf_counter()
+        self.render_time = 0.0
+
+        # measures the time spent on the stages of every frame (see profiler module)
+        self.profiler = FrameProfiler(TARGET_FPS, enabled = PROFILER_ENABLED)
+
         # ------------- end of general initialization -------------
 
 
 
         # ------------- (debug mode) game mode selection -----------------------
 
-        if DEBUG_CHOOSE_GAME_MODE:
+        if self.replay is not None:
+            game_mode_choice = 2 # a replay is played back as a single race
+        elif DEBUG_CHOOSE_GAME_MODE:
             print("Choose a game mode: ")
             print("1: League race")
             print("2: Single race")
@@ -105,7 +152,7 @@ class App:
 
         # ------------- track selection (todo) -------------
 
-        race_choice = DEFAULT_SINGLE_RACE_CHOICE
+        race_choice = self.replay.race_index if self.replay is not None else DEFAULT_SINGLE_RACE_CHOICE
 
         # ------------- end of track selection -------------
 
@@ -133,7 +180,9 @@ class App:
 
         # debug only: player chooses a machine
         # outside debug mode, the player is using Purple Comet
-        if DEBUG_CHOOSE_MACHINE:
+        if self.replay is not None:
+            player_machine = MACHINES[self.replay.machine_index]
+        elif DEBUG_CHOOSE_MACHINE:
             print("0: Purple Comet")
             print("1: Faster Purple Comet")
             print("2: Slower Purple Comet")
@@ -207,10 +256,9 @@ class App:
             timer_sprites = self.timer_sprites
         )
 
-        # Take initial timestamp that is 
-        # used for the timer that tracks the time since race start. 
-        # Need to used method get_time since self.time field is not initialized at this point.
-        self.race_start_timestamp = self.time
+        # Race clock: whole microseconds since race start.
+        # Drives the physics and the timer (see update).
+        self.race_clock = 0
 
         # sets status flag
         self.in_racing_mode = True
@@ -227,41 +275,71 @@ class App:
         
         # For things only needed to be done during a race. 
         if self.in_racing_mode:
-            # updates the player based on time elapsed since game start
-            self.player.update(self.time, delta)
+            # Determine the inputs of this frame and advance the race clock.
+            # The physics run on the race clock (not the wall clock) and the deltas are quantized to whole microseconds,
+            # so that replaying the recorded deltas reproduces the exact same race (see replay module).
+            frame = next(self.replay_frames, None) if self.replay_frames is not None else None
+            if frame is not None:
+                inputs, delta, race_time = frame
+                self.race_clock = round(race_time * 1000000)
+            else:
+                # after the end of a replay, the machine just keeps rolling
+                inputs = InputState() if self.replay is not None else InputState.from_keyboard()
+                delta_microseconds = round(delta * 1000000)
+                self.race_clock += delta_microseconds
+                delta, race_time = delta_microseconds / 1000000, self.race_clock / 1000000
+
+                if self.recording is not None:
+                    self.recording.append(inputs, delta_microseconds)
+
+            # updates the player based on the race time
+            with self.profiler.stage("player"):
+                self.player.update(race_time, delta, inputs)
 
             # updates camera position (which is done mainly based on player position)
-            self.camera.update()
+            with self.profiler.stage("camera"):
+                self.camera.update()
 
             # causes the Mode7-rendered environment to update
-            self.mode7.update(self.camera)
+            render_start = time.perf_counter()
+            with self.profiler.stage("mode7 update"):
+                self.mode7.update(self.camera)
+            self.render_time += time.perf_counter() - render_start
 
             # Update timer on UI if player has not finished the current race yet.
             if not self.player.finished:
-                seconds_since_race_start = self.time - self.race_start_timestamp
                 self.ui.update(
-                    elapsed_milliseconds = seconds_since_race_start * 1000
+                    elapsed_milliseconds = self.race_clock / 1000
                 )
 
-            # Checks whether player has finished the race.
-            # If so, a status flag is set in the player instance if not done already.
-            if self.current_league.current_race().player_finished_race() and not self.player.finished:
-                self.player.finished = True
+            # Checks whether player has finished the race 
+            # or completed at least one lap (activates their boost power)
+            # and sets the respective status flags in the player instance if not done already.
+            self.player.update_race_progress()
+
+            # record the lap of the player for the ghost
+            if self.ghost is not None:
+                self.ghost.update(race_time, self.player)
+
+            # the recording of a race ends when the player finishes it
+            if self.player.finished and self.recording is not None:
+                self.save_recording()
 
             # load next race if player finished the current one and pushed the confirm button (which set the flag)
             if self.should_load_next_race:
                 self.player.finished = False
                 self.load_race(self.current_league.next_race())
 
-            # Checks whether player has completed at least one lap
-            # and activates their boost power if so (and not activated yet).
-            if self.current_league.current_race().player_completed_first_lap() and not self.player.has_boost_power:
-                self.player.has_boost_power = True
+        # adapt the resolution to the time spent on this frame (before waiting for the frame rate cap)
+        if self.resolution is not None and self.in_racing_mode:
+            self.update_resolution()
 
         # Updates clock.
         # The passed framerate argument slows time in the game down artificially
         # so that the game never runs with a higher framerate than the passed one.
         self.clock.tick(TARGET_FPS)
+        self.frame_start = time.perf_counter()
+        self.render_time = 0.0
 
         # caption of the window displays current frame rate
         # (f'...' is a more readable + faster way to write format strings than with "%")
@@ -273,6 +351,9 @@ class App:
 
     # (Re-)loads the passed race.
     def load_race(self, race):
+        # save the recording of the previous (or restarted) race before its progress data is reset
+        self.save_recording()
+
         # reset all progress data stored for this race
         race.reset_data()
 
@@ -284,23 +365,80 @@ class App:
 
         # Replace renderer field with Mode-7 renderer for the new race track.
         # Third parameter determines whether the renderer has a fog effect applied or not.
+        # If the textures of the race have been preloaded, they are taken from the texture cache.
         self.mode7 = Mode7(
             app = self,
             floor_tex_path = race.floor_texture_path,
             bg_tex_path = race.bg_texture_path,
-            is_foggy = race.is_foggy
+            is_foggy = race.is_foggy,
+            pixel_step = self.resolution.pixel_step() if self.resolution is not None else 1
         )
 
         # reset timer
-        self.race_start_timestamp = self.time
+        self.race_clock = 0
 
-        # restart music
-        mixer.music.load(race.music_track_path)
+        # sprites standing in the scene (e.g. the ghost)
+        self.billboards = BillboardLayer()
+
+        # the ghost drives the best lap of the race in time-attack races
+        if GHOSTS_ENABLED and race.race_mode == TIME_ATTACK_RACE_MODE:
+            self.ghost = Ghost(race, self.player.machine.driving_anim.frames[0], self.billboards, self.mode7, self.camera)
+        else:
+            self.ghost = None
+
+        # Render the first frame of the race right away (while the loading screen or the previous race is still displayed):
+        # if the render kernel is not compiled for the textures of this race yet,
+        # it is compiled (or loaded from the kernel cache, see kernel_cache module) now
+        # instead of freezing the first frame of the race.
+        self.camera.update()
+        warm_up_start = time.perf_counter()
+        self.mode7.update(self.camera)
+        self.warm_up_time = time.perf_counter() - warm_up_start
+
+        # start playing back the replay from the beginning or start recording the race
+        if self.replay is not None:
+            self.replay_frames = self.replay.frames()
+        elif RECORD_REPLAYS:
+            self.recording = Replay.for_race(race, self.player.machine)
+
+        # restart music (from memory if it has been preloaded)
+        music_file, music_name_hint = self.preloader.music_file(race.music_track_path)
+        mixer.music.load(music_file, music_name_hint)
         mixer.music.play()
 
         # reset flag
         self.should_load_next_race = False
 
+        # start loading the assets of the race after this one in the background
+        upcoming_race = self.current_league.upcoming_race()
+        if upcoming_race is not None:
+            self.preloader.preload(upcoming_race, self.screen)
+
+        # the time spent on loading the race does not count as time of its first frame
+        self.get_time()
+        self.last_frame = self.time
+
+    # Passes the times of the current frame to the dynamic resolution controller
+    # and changes the internal resolution of the renderer if the controller decides so.
+    def update_resolution(self):
+        frame_time = time.perf_counter() - self.frame_start
+        if self.resolution.add_frame_time(frame_time, self.render_time):
+            self.mode7.set_pixel_step(self.resolution.pixel_step())
+
+    # Saves the replay that is currently being recorded (if any) to the replay directory
+    # and stops recording.
+    def save_recording(self):
+        if self.recording is not None and self.recording.length() > 0:
+            self.recording.completed_laps = self.player.current_race.player_completed_laps
+
+            os.makedirs(REPLAY_DIRECTORY, exist_ok = True)
+            self.recording.save(os.path.join(
+                REPLAY_DIRECTORY,
+                time.strftime("%Y%m%d-%H%M%S") + "_race" + str(self.recording.race_index) + ".replay"
+            ))
+
+        self.recording = None
+
     # (Re-)initializes all sprite groups as empty groups.
     # Can be used to tidy up when switching game modes.
     def initialize_sprite_groups(self):
@@ -310,23 +448,33 @@ class App:
 
     def draw(self):
         # draws the mode-7 environment
-        self.mode7.draw()
+        render_start = time.perf_counter()
+        with self.profiler.stage("mode7 draw"):
+            self.mode7.draw()
+        self.render_time += time.perf_counter() - render_start
 
-        # draws static sprites (e.g. player shadow) to screen
-        self.static_sprites.draw(self.screen)
+        with self.profiler.stage("sprites"):
+            # draws the billboards standing in the scene (behind all sprites)
+            if self.in_racing_mode:
+                self.billboards.draw(self.screen, self.mode7, self.camera)
 
-        # draws moving sprites (e.g. player) to screen
-        self.moving_sprites.draw(self.screen)
+            # draws static sprites (e.g. player shadow) to screen
+            self.static_sprites.draw(self.screen)
 
-        # draws UI sprites to screen
-        self.ui_sprites.draw(self.screen)
+            # draws moving sprites (e.g. player) to screen
+            self.moving_sprites.draw(self.screen)
 
-        # draws debug objects like energy bar
+            # draws UI sprites to screen
+            self.ui_sprites.draw(self.screen)
+
+        # draws debug objects like energy bar and the profiler overlay
         if self.in_racing_mode:
             self.draw_racing_mode_debug_objects()
+        self.profiler.draw_overlay(self.screen)
 
         # update the contents of the whole display
-        pygame.display.flip()
+        with self.profiler.stage("flip"):
+            pygame.display.flip()
 
     def get_time(self):
         self.time = time.time()
@@ -336,6 +484,9 @@ class App:
             # Terminate the process running the game 
             # if escape key is pressed or anything else caused the quit-game event
             if event.type == pygame.QUIT:
+                self.save_recording()
+                if self.profiler.recorded_frames > 0:
+                    print(self.profiler.report())
                 pygame.quit()
                 sys.exit()
 
@@ -345,12 +496,15 @@ class App:
                     self.should_load_next_race = True 
                 if event.key == STD_DEBUG_RESTART_KEY and DEBUG_RESTART_RACE_ON_R:
                     self.load_race(self.current_league.current_race())
+                if event.key == STD_PROFILER_KEY:
+                    self.profiler.toggle()
 
     # Main game loop, runs until termination of process.
     def run(self):
         while True:
             # handle events
-            self.check_event()
+            with self.profiler.stage("events"):
+                self.check_event()
 
             # update field counting the milliseconds since game start
             self.get_time()
@@ -361,6 +515,33 @@ class App:
             # render frame
             self.draw()
 
+            # store the stage times of this frame
+            self.profiler.end_frame()
+
+            if self.startup_time is None:
+                self.report_startup_time()
+
+    # Shows a loading screen.
+    # Displayed at startup until the first race is loaded 
+    # (which takes a while if the render kernel needs to be compiled, see load_race).
+    def draw_loading_screen(self):
+        self.screen.fill((0, 0, 0))
+        pygame.font.init()
+        text = pygame.font.Font(None, 24).render("LOADING...", True, (255, 255, 255))
+        self.screen.blit(text, text.get_rect(center = (HALF_WIDTH, HALF_HEIGHT)))
+        pygame.display.flip()
+
+    # Measures the time from the start of the game until the first frame was displayed (cold start)
+    # and prints it together with the time spent on compiling or loading the render kernel
+    # if enabled in the debug settings.
+    def report_startup_time(self):
+        self.startup_time = time.perf_counter() - GAME_START_TIME
+        if REPORT_STARTUP_TIME:
+            kernel = Mode7.render_frame_scanline if self.mode7.floor_sampler == "scanline" else Mode7.render_frame
+            kernel_source = "loaded from cache" if kernel.stats.cache_hits else "compiled"
+            print("startup: first frame after " + str(round(self.startup_time * 1000)) + " ms (render kernel " 
+                + kernel_source + " in " + str(round(self.warm_up_time * 1000)) + " ms)")
+
     # Logs various game state information to the console when key P is pressed. 
     def debug_logs(self):
         keys = pygame.key.get_pressed()
@@ -1,10 +1,60 @@
 import pygame
 import numpy
+import gc
 
 # JIT compiler and prange function for performance speedup
-from numba import njit, prange
+from numba import njit, prange, types, config, set_num_threads
+from numba.extending import overload
 
 from settings.renderer_settings import *
+from texture import TEXTURE_CACHE
+from kernel_cache import JIT_CACHE
+
+# Returns the texel (x, y) of the passed texture.
+# Used from within the render kernels, the implementation is chosen by numba
+# depending on the memory layout of the texture (see overload below and the texture module).
+def fetch_texel(texture, x, y):
+    pass
+
+@overload(fetch_texel, jit_options = {"fastmath": True})
+def fetch_texel_impl(texture, x, y):
+    # "tiled" layout: two more axes than the linear layout (tile index and position within the tile)
+    if texture.ndim >= 4:
+        def fetch_tiled(texture, x, y):
+            return texture[x // TEXTURE_TILE_SIZE, y // TEXTURE_TILE_SIZE, x % TEXTURE_TILE_SIZE, y % TEXTURE_TILE_SIZE]
+        return fetch_tiled
+
+    # "linear" layout
+    def fetch_linear(texture, x, y):
+        return texture[x, y]
+    return fetch_linear
+
+# Applies the attenuation coefficient and the fog value of a row to the passed floor texel.
+# Used from within the render kernels, the implementation is chosen by numba
+# depending on the pixel format of the texel (see overload below).
+def shade_texel(texel, attenuation, fog, pixel_shifts):
+    pass
+
+@overload(shade_texel, jit_options = {"fastmath": True})
+def shade_texel_impl(texel, attenuation, fog, pixel_shifts):
+    # "rgb" pixel format: texel is an array of the three color components,
+    # attenuation and fog are floats and applied component-wise
+    if isinstance(texel, types.Array):
+        def shade_rgb(texel, attenuation, fog, pixel_shifts):
+            return (texel[0] * attenuation + fog,
+                texel[1] * attenuation + fog,
+                texel[2] * attenuation + fog)
+        return shade_rgb
+
+    # "packed" pixel format: texel is a 32-bit word,
+    # attenuation is a fixed-point integer (256 = 1.0) and fog an integer.
+    # The color components are extracted, shaded and packed again with integer arithmetic only.
+    def shade_packed(texel, attenuation, fog, pixel_shifts):
+        r = (((texel >> pixel_shifts[0]) & 0xFF) * attenuation >> 8) + fog
+        g = (((texel >> pixel_shifts[1]) & 0xFF) * attenuation >> 8) + fog
+        b = (((texel >> pixel_shifts[2]) & 0xFF) * attenuation >> 8) + fog
+        return (r << pixel_shifts[0]) | (g << pixel_shifts[1]) | (b << pixel_shifts[2])
+    return shade_packed
 
 class Mode7:
     # Initialization method that loads the textures (specified via path passed to constructor), 
@@ -14,7 +64,31 @@ class Mode7:
     # The horizon parameter describes the horizon height of the scenes rendered with this renderer
     # i.e. the minimum height of floor texture pixels 
     # (for this, note that the y coordinate decreases down the screen). 
-    def __init__(self, app, floor_tex_path, bg_tex_path, is_foggy, horizon = STD_HORIZON):
+    #
+    # The floor sampler parameter selects the algorithm used to compute the floor pixels
+    # (see FLOOR_SAMPLERS in the renderer settings).
+    #
+    # If zero_copy is True, frames are rendered directly into the pixel memory of the display surface
+    # instead of into a separate screen array that is copied to the display surface in every frame.
+    #
+    # The pixel format parameter selects how textures and frames are represented in memory
+    # (see PIXEL_FORMATS in the renderer settings and the texture module).
+    #
+    # If mipmapped is True, the floor is sampled from the mip chain of the floor texture
+    # (see MIPMAPPED_FLOOR in the renderer settings).
+    #
+    # The texture layout parameter selects how the floor texture is arranged in memory
+    # (see TEXTURE_LAYOUTS in the renderer settings and the texture module).
+    #
+    # The pixel step parameter sets the internal resolution of the renderer (see set_pixel_step).
+    #
+    # The partition parameter selects how the frame is split up between the render threads
+    # (see RENDER_PARTITIONS in the renderer settings), the threads parameter sets their number
+    # (0: as many as numba uses by default, i.e. one per CPU core).
+    def __init__(self, app, floor_tex_path, bg_tex_path, is_foggy, horizon = STD_HORIZON, 
+            floor_sampler = STD_FLOOR_SAMPLER, zero_copy = ZERO_COPY_PRESENTATION, 
+            pixel_format = STD_PIXEL_FORMAT, mipmapped = MIPMAPPED_FLOOR, texture_layout = STD_TEXTURE_LAYOUT,
+            pixel_step = 1, partition = STD_RENDER_PARTITION, threads = RENDER_THREADS):
         # linking renderer to the app
         self.app = app
 
@@ -22,136 +96,539 @@ class Mode7:
         self.is_foggy = is_foggy
         self.horizon = horizon
 
-        # load floor texture
-        self.floor_tex = pygame.image.load(floor_tex_path).convert()
+        if not floor_sampler in FLOOR_SAMPLERS:
+            raise ValueError("unknown floor sampler: " + str(floor_sampler))
+        self.floor_sampler = floor_sampler
+
+        if not pixel_format in PIXEL_FORMATS:
+            raise ValueError("unknown pixel format: " + str(pixel_format))
+        self.pixel_format = pixel_format
+
+        if not texture_layout in TEXTURE_LAYOUTS:
+            raise ValueError("unknown texture layout: " + str(texture_layout))
+        self.texture_layout = texture_layout
+
+        if not partition in RENDER_PARTITIONS:
+            raise ValueError("unknown render partition: " + str(partition))
+        self.partition = partition
+
+        # numba cannot use more threads than it has started
+        self.threads = min(threads, config.NUMBA_NUM_THREADS)
+
+        # Bit shifts of the color components in the display surface's pixel format.
+        # Packed textures use the same layout so their pixels can be written to the screen as they are.
+        self.pixel_shifts = tuple(self.app.screen.get_shifts()[:3])
+
+        # Load floor and background texture into arrays representing their pixels
+        # (in the pixel format of this renderer).
+        # The floor is given as a tuple of mip levels (only the full resolution level if not mipmapped).
+        self.floor_levels, self.floor_tex_size, self.bg_array = Mode7.load_textures(
+            screen = self.app.screen,
+            floor_tex_path = floor_tex_path,
+            bg_tex_path = bg_tex_path,
+            pixel_format = self.pixel_format,
+            mipmapped = mipmapped,
+            texture_layout = self.texture_layout
+        )
         
-        # store floor texture size for later use
-        self.floor_tex_size = self.floor_tex.get_size()
+        # store texture sizes for later use
+        # (every mip level has half the size of the previous one, the shapes of tiled levels include padding)
+        self.floor_level_sizes = numpy.array(
+            [(self.floor_tex_size[0] >> level, self.floor_tex_size[1] >> level) for level in range(len(self.floor_levels))],
+            dtype = numpy.int64
+        )
+        self.bg_tex_size = self.bg_array.shape[:2]
+
+        # background rows above the horizon, wrapped around horizontally (see draw_sky)
+        self.sky_strip = Mode7.sky_strip(self.bg_array, self.horizon)
+
+        # A view on the pixels of the display surface can only be created for 24 and 32 bit surfaces
+        # (for the packed pixel format: only for 32 bit surfaces),
+        # otherwise the renderer falls back to copying a separate screen array.
+        if self.pixel_format == "packed":
+            self.zero_copy = zero_copy and self.app.screen.get_bytesize() == 4
+        else:
+            self.zero_copy = zero_copy and self.app.screen.get_bytesize() in (3, 4)
+
+        # Sets up the render target for the internal resolution
+        # and computes the per-row lookup tables for the floor render (inverse depth, attenuation, fog and mip level).
+        # All of these only depend on the screen row, the horizon and the internal resolution,
+        # so they are computed once here instead of once per pixel and frame.
+        self.set_pixel_step(pixel_step)
+
+    # Changes the internal resolution of the renderer.
+    # With a pixel step of s, only every s-th column and row of the screen is rendered
+    # (WIN_RES / s pixels, s * s times fewer than at full resolution)
+    # and the frame is scaled up to the window resolution when it is drawn.
+    # Used by the dynamic resolution controller (see resolution module) to keep up the frame rate.
+    def set_pixel_step(self, pixel_step):
+        self.pixel_step = pixel_step
+
+        # the sky needs to be drawn into the new render target in any case
+        self.sky_offset = None
 
-        # Create 3D array representing the pixels representing the floor.
-        # More precisely: copies the pixels from the surface representing the floor texture
-        # into a new 3D array.
-        self.floor_array = pygame.surfarray.array3d(self.floor_tex)
+        # internal resolution (rounded up so that the whole screen is covered)
+        self.render_res = (-(-WIDTH // pixel_step), -(-HEIGHT // pixel_step))
 
-        # load background texture
-        self.bg_tex = pygame.image.load(bg_tex_path).convert()
+        # At full resolution, frames are rendered onto the display surface.
+        # Otherwise, they are rendered onto a smaller surface (in the same pixel format)
+        # that is scaled up onto the display surface in the draw method.
+        if pixel_step == 1:
+            self.render_surface = self.app.screen
+        else:
+            self.render_surface = pygame.Surface(self.render_res, 0, self.app.screen)
 
-        # scale ceiling texture to floor texture size
-        self.bg_tex_size = self.bg_tex.get_size()
+        # Every rendered pixel is scaled up to exactly pixel_step x pixel_step pixels.
+        # If the pixel step does not divide the screen size, the scaled frame is larger than the screen
+        # (the last rendered column and row are partly outside), so it is scaled onto a surface of its own
+        # and cropped when copied onto the display surface (instead of squeezing it to the screen size).
+        scaled_res = (self.render_res[0] * pixel_step, self.render_res[1] * pixel_step)
+        if scaled_res == WIN_RES:
+            self.scaled_surface = None
+        else:
+            self.scaled_surface = pygame.Surface(scaled_res, 0, self.app.screen)
 
-        # represent ceiling by 3D array analogously to floor
-        self.bg_array = pygame.surfarray.array3d(self.bg_tex)
+        # create an array representing the pixels of the render surface
+        # (not needed if rendering directly into the surface)
+        if self.zero_copy:
+            self.screen_array = None
+        elif self.pixel_format == "packed":
+            self.screen_array = numpy.zeros(self.render_res, dtype = numpy.uint32)
+        else:
+            self.screen_array = pygame.surfarray.array3d(pygame.Surface(self.render_res))
 
-        # create an array representing the screen pixels
-        self.screen_array = pygame.surfarray.array3d(pygame.Surface(WIN_RES))
+        # the mip levels depend on the distance between the rendered pixels
+        self.compute_row_tables()
+
+    # Returns the arrays of the passed floor and background textures
+    # in the passed pixel format (for rendering onto the passed display surface).
+    # The floor texture is returned as a tuple of its mip levels
+    # (containing only the texture itself if mipmapped is False) in the passed texture layout,
+    # followed by its size (in pixels).
+    #
+    # Textures and mip chains are shared via the texture cache, so they are only built if not used recently.
+    # Calling this method ahead of time (e.g. from the asset preloader)
+    # makes the construction of a renderer for the same textures instant.
+    @staticmethod
+    def load_textures(screen, floor_tex_path, bg_tex_path, pixel_format = STD_PIXEL_FORMAT, mipmapped = MIPMAPPED_FLOOR,
+            texture_layout = STD_TEXTURE_LAYOUT):
+        pixel_shifts = tuple(screen.get_shifts()[:3])
+        floor_array = TEXTURE_CACHE.get(floor_tex_path, pixel_format, pixel_shifts)
+        if texture_layout == "tiled":
+            floor_levels = TEXTURE_CACHE.get_tiled_levels(floor_tex_path, pixel_format, pixel_shifts, mipmapped)
+        elif mipmapped:
+            floor_levels = TEXTURE_CACHE.get_mip_chain(floor_tex_path, pixel_format, pixel_shifts)
+        else:
+            floor_levels = (floor_array,)
+        bg_array = TEXTURE_CACHE.get(bg_tex_path, pixel_format, pixel_shifts)
+        return floor_levels, floor_array.shape[:2], bg_array
+
+    # Changes the horizon height of the scenes rendered with this renderer.
+    # The per-row lookup tables depend on the horizon and thus need to be recomputed.
+    def set_horizon(self, horizon):
+        self.horizon = horizon
+        self.compute_row_tables()
+
+        # the sky covers all rows above the horizon
+        self.sky_strip = Mode7.sky_strip(self.bg_array, self.horizon)
+        self.sky_offset = None
+
+    # Returns the sky strip of the passed background texture for the passed horizon:
+    # the rows of the background above the horizon (repeated vertically if the texture is lower than the horizon)
+    # followed by its first WIDTH columns again.
+    # Thus, the sky for any rotation of the background is a contiguous range of WIDTH columns in the strip.
+    @staticmethod
+    def sky_strip(bg_array, horizon):
+        columns = numpy.arange(bg_array.shape[0] + WIDTH) % bg_array.shape[0]
+        rows = numpy.arange(horizon) % bg_array.shape[1]
+        return numpy.ascontiguousarray(bg_array[columns][:, rows])
+
+    # (Re-)computes the per-row lookup tables used by the floor render
+    # from the current horizon, fog setting and mip chain.
+    def compute_row_tables(self):
+        self.row_inv_depth, self.row_attenuation, self.row_fog = Mode7.row_tables(
+            horizon = self.horizon,
+            is_foggy = self.is_foggy
+        )
+        self.row_mip_level, self.row_mip_scale = Mode7.row_mip_tables(
+            row_inv_depth = self.row_inv_depth,
+            num_levels = len(self.floor_levels),
+            pixel_step = self.pixel_step
+        )
+
+        # The packed pixel format shades with integer arithmetic only:
+        # the attenuation is stored as fixed-point number (256 = 1.0), the fog is rounded.
+        if self.pixel_format == "packed":
+            self.row_attenuation = numpy.round(self.row_attenuation * 256).astype(numpy.int32)
+            self.row_fog = numpy.round(self.row_fog).astype(numpy.int32)
+
+    # Computes the lookup tables for the rows of the screen (indexed by the screen row j).
+    # Entries for rows above the horizon are not used by the floor render and remain 0.
+    #
+    # Returns a triple of arrays:
+    # inv_depth - 1 / z where z is the "depth" (screen height coordinate) of the row
+    # attenuation - coefficient in the interval [0, 1] to fade out the floor towards the horizon
+    # fog - value added to every color component of the floor pixels in the row (0 if not foggy)
+    @staticmethod
+    def row_tables(horizon, is_foggy):
+        inv_depth = numpy.zeros(HEIGHT)
+        attenuation = numpy.zeros(HEIGHT)
+        fog = numpy.zeros(HEIGHT)
+
+        rows = numpy.arange(horizon, HEIGHT)
+
+        # Small constant added to the screen height coordinate (z) to prevent divide-by-0 errors.
+        z = rows - horizon + 0.01
+        inv_depth[horizon:] = 1 / z
+
+        # To prevent ugly artifacts at the horizon:
+        # compute some attenuation coefficient in the interval [0, 1] based on the "depth" value
+        attenuation[horizon:] = numpy.clip(7.5 * (numpy.abs(z) / HALF_HEIGHT), 0, 1)
+
+        # Compute a fog effect depending on whether the rendered scene is foggy.
+        if is_foggy:
+            fog[horizon:] = (1 - attenuation[horizon:]) * FOG_DENSITY
+
+        return inv_depth, attenuation, fog
+
+    # Computes the mip level of the floor texture sampled in every row of the screen.
+    #
+    # Moving one pixel along a row moves SCALE * inv_depth texels across the floor texture
+    # (the footprint of a pixel, pixel_step times as large if only every pixel_step-th pixel is rendered). 
+    # The level is chosen so that the footprint is about one texel in that level,
+    # i.e. level = log2(footprint) (rounded down, shifted by MIP_LEVEL_BIAS and clamped to the available levels).
+    #
+    # Returns a pair of arrays:
+    # mip_level - index of the mip level of the row
+    # mip_scale - factor that converts full resolution texture coordinates into coordinates in that level
+    @staticmethod
+    def row_mip_tables(row_inv_depth, num_levels, pixel_step = 1):
+        footprint = numpy.maximum(row_inv_depth * SCALE * pixel_step, 1)
+        mip_level = numpy.floor(numpy.log2(footprint)).astype(numpy.int64) + MIP_LEVEL_BIAS
+        mip_level = numpy.clip(mip_level, 0, num_levels - 1)
+        mip_scale = 1 / (2.0 ** mip_level)
+        return mip_level, mip_scale
+
+    # Projects the passed points on the floor onto the screen as seen from the passed camera.
+    # This is the inverse of the floor projection in render_frame:
+    # the floor pixel (i, j) that render_frame computes for a point is exactly where the point is projected to.
+    #
+    # Parameters:
+    # camera - the camera that the current frame is rendered from
+    # positions - N x 2 array of the points (in the same coordinates as the player position)
+    #
+    # Returns a quadruple of arrays (one entry per point):
+    # screen_x, screen_y - screen coordinates of the points (only meaningful for points in front of the camera)
+    # scale - factor by which objects at the points appear scaled (1 at the distance between camera and player)
+    # in_front - whether the point is in front of the camera and below the horizon on the screen
+    def project(self, camera, positions):
+        positions = numpy.asarray(positions, dtype = numpy.float64).reshape(-1, 2)
+        sin, cos = numpy.sin(camera.angle), numpy.cos(camera.angle)
+        d0 = positions[:, 0] - camera.position[0]
+        d1 = positions[:, 1] - camera.position[1]
+
+        # Depth of the points along the view direction.
+        # In render_frame, a floor pixel in row j has depth (j + FOCAL_LEN) / z with z = j - horizon + 0.01,
+        # so only points at a depth greater than 1 appear on the screen (below the horizon).
+        depth = d1 * sin + d0 * cos
+        in_front = depth > 1
+        depth = numpy.where(in_front, depth, 2) # placeholder depth for points behind the camera (avoids division by 0)
+
+        # invert the depth formula for the row and the rotation for the column
+        screen_y = self.screen_row(depth)
+        screen_x = HALF_WIDTH - (screen_y - self.horizon + 0.01) * (d1 * cos - d0 * sin)
+
+        scale = camera.camera_distance / depth
+
+        return screen_x, screen_y, scale, in_front
+
+    # Returns the screen row (as a float) in which floor points at the passed depth (greater than 1) appear.
+    # Inverse of the depth (j + FOCAL_LEN) / (j - horizon + 0.01) of the floor pixels in row j in render_frame.
+    def screen_row(self, depth):
+        shifted_horizon = self.horizon - 0.01
+        return (FOCAL_LEN + depth * shifted_horizon) / (depth - 1)
+
+    # Returns the size (width, height) of the blocks of pixels that the render kernels distribute over the threads
+    # for the partition and the internal resolution of this renderer.
+    def block_size(self):
+        if self.partition == "rows":
+            return self.render_res[0], 1
+        if self.partition == "column blocks":
+            return RENDER_COLUMN_BLOCK_WIDTH, self.render_res[1]
+        return RENDER_TILE_SIZE, RENDER_TILE_SIZE
 
     # Updates the mode7-based environment.
     # A camera reference is passed to be able
     # to render the frame based on the camera's (and thus player's) current position and rotation.
     def update(self, camera):
-        # rendering the frame
-        self.screen_array = self.render_frame(
-            floor_array = self.floor_array, 
-            bg_array = self.bg_array, 
-            screen_array = self.screen_array, 
-            floor_tex_size = self.floor_tex_size, 
-            bg_tex_size = self.bg_tex_size, 
-            is_foggy = self.is_foggy, 
+        # choose the kernel that renders the frame depending on the floor sampler
+        if self.floor_sampler == "scanline":
+            render = self.render_frame_scanline
+        else:
+            render = self.render_frame
+
+        # Target of the render: either a view on the pixels of the render surface (no copy involved)
+        # or the separate screen array which is copied to the render surface in the draw method.
+        if self.zero_copy and self.pixel_format == "packed":
+            screen_array = pygame.surfarray.pixels2d(self.render_surface)
+        elif self.zero_copy:
+            screen_array = pygame.surfarray.pixels3d(self.render_surface)
+        else:
+            screen_array = self.screen_array
+
+        # The number of threads is set per calling thread in numba,
+        # so it is set right before rendering (in case other renderers use different numbers).
+        if self.threads > 0:
+            set_num_threads(self.threads)
+
+        # rendering the frame: the sky (background) above the horizon and the floor below
+        self.draw_sky(screen_array, camera.angle)
+        block_width, block_height = self.block_size()
+        render(
+            floor_levels = self.floor_levels, 
+            floor_level_sizes = self.floor_level_sizes,
+            screen_array = screen_array, 
+            row_inv_depth = self.row_inv_depth,
+            row_attenuation = self.row_attenuation,
+            row_fog = self.row_fog,
+            row_mip_level = self.row_mip_level,
+            row_mip_scale = self.row_mip_scale,
+            pixel_shifts = self.pixel_shifts,
             pos = camera.position,
             angle = camera.angle,
-            horizon = self.horizon
+            horizon = self.horizon,
+            width = self.render_res[0],
+            height = self.render_res[1],
+            pixel_step = self.pixel_step,
+            block_width = block_width,
+            block_height = block_height
         )
 
-    # Computes a single frame of the mode-7 environment pixel by pixel.
+        # The render surface stays locked as long as a view on its pixels exists.
+        # The view is released right away so that sprites can be drawn onto the surface.
+        del screen_array
+
+        # When a kernel is compiled on its first call, numba keeps the view alive in a reference cycle.
+        # Collecting it unlocks the render surface (only happens in frames in which a kernel was compiled).
+        if self.zero_copy and self.render_surface.get_locked():
+            gc.collect()
+
+    # Fills the rows of the passed screen array above the horizon with the background,
+    # shifted by the passed angle (the background moves when the player rotates).
+    #
+    # The sky is a range of columns of the sky strip, so it is copied with a single slice.
+    # It only depends on the angle: if the render target keeps its contents between frames
+    # (the screen array and the render surface at reduced resolution do, 
+    # the display surface does not since sprites are drawn onto it),
+    # the sky is only drawn again when the shift of the background has changed.
+    def draw_sky(self, screen_array, angle):
+        offset = -int(angle * BACKGROUND_ROTATION_SPEED) % self.bg_tex_size[0]
+        if offset == self.sky_offset:
+            return
+
+        # every pixel_step-th column and row (see set_pixel_step)
+        step = self.pixel_step
+        screen_array[:, :-(-self.horizon // step)] = self.sky_strip[offset : offset + self.render_res[0] * step : step, ::step]
+
+        if not (self.zero_copy and self.render_surface is self.app.screen):
+            self.sky_offset = offset
+
+    # Computes a single frame of the mode-7 floor pixel by pixel.
     # Needs numba just-in-time compiler support (decorators) 
     # to achieve a reasonable framerate when executed every frame.
+    # The GIL is released while rendering so that background threads (e.g. the asset preloader)
+    # can make progress without delaying the game loop.
     # 
     # Parameters:
-    # floor_array: array containing the pixels of the floor texture
-    # bg_array: array containing the pixels of the background texture
-    # screen_array: array containing the rendered frame (updated pixel by pixel)
-    # floor_tex_size: size of the floor texture
-    # bg_tex_size: size of the background texture
-    # is_foggy: whether the scene of which a frame is rendered has a fog effect in it
+    # floor_levels: tuple of the mip levels of the floor texture (arrays containing their pixels)
+    # floor_level_sizes: sizes (in pixels) of the mip levels
+    # screen_array: array containing the rendered frame (updated pixel by pixel, width x height pixels,
+    #   only the rows below the horizon are written, see draw_sky for the others)
+    # row_inv_depth: per-row table of the inverse depth values (see row_tables)
+    # row_attenuation: per-row table of the attenuation coefficients
+    # row_fog: per-row table of the fog values (all 0 if the scene is not foggy)
+    # row_mip_level: per-row table of the sampled mip level (see row_mip_tables)
+    # row_mip_scale: per-row table of the factors converting texture coordinates into coordinates in the mip level
+    # pixel_shifts: bit shifts of the color components (only used by the packed pixel format)
     # pos: current position of the camera
     # angle: current angle by which the camera is rotated
     # horizon: the min y coordinate of floor pixels (note: y increases down the screen)
+    # width, height: internal resolution (size of the screen array)
+    # pixel_step: distance between two rendered pixels on the screen (the pixel (k, l) of the screen array
+    #   shows the screen pixel (i, j) = (k * pixel_step, l * pixel_step), see set_pixel_step)
+    # block_width, block_height: size of the blocks of pixels that are rendered in parallel (see block_size)
     @staticmethod
-    @njit(fastmath=True, parallel=True)
-    def render_frame(floor_array, bg_array, screen_array, floor_tex_size, bg_tex_size, 
-        is_foggy, pos, angle, horizon):
+    @njit(fastmath=True, parallel=True, nogil=True, cache=JIT_CACHE)
+    def render_frame(floor_levels, floor_level_sizes, screen_array, 
+        row_inv_depth, row_attenuation, row_fog, row_mip_level, row_mip_scale, pixel_shifts, pos, angle, horizon,
+        width, height, pixel_step, block_width, block_height):
         # Compute the sine and cosine values of the player angle
         # to use them to render the environment based on the player's rotation.
         sin, cos = numpy.sin(angle), numpy.cos(angle)
 
+        # first row of the screen array that shows the floor
+        floor_start = -(-horizon // pixel_step)
+
         # Compute color value for every single pixel (i, j).
-        # prange function (instead of range function) used for outer loop for performance reasons.
-        for i in prange(WIDTH):
-            # compute background image render
-            for j in range(0, horizon):
-                # background image is shifted by angle the player is rotated by
-                screen_array[i][j] = bg_array[(i - int(angle * BACKGROUND_ROTATION_SPEED)) % bg_tex_size[0]][j % bg_tex_size[1]]
-            # compute floor render
-            for j in range(horizon, HEIGHT):
-                # Let us imagine that the floor texture is tiled infinitely 
-                # in both horizontal and vertical direction on a 2D plane.
-                # Let us assume that this plane's horizontal and vertical axes
-                # are labeled with px and py, respectively.
-                # Furthermore assume that the screen's horizontal and vertical axes 
-                # are labeled with x and z, respectively,
-                # while y is an imaginary axis coming out of the screen.
-                #
-                # Idea: to emulate the mode-7 effect, compute which pixel of the floor texture 
-                # is over the pixel (i, j) of the screen in this frame
+        # The floor rows of the screen array are divided into blocks (see RENDER_PARTITIONS in the renderer settings)
+        # which are distributed over the threads by the prange function (instead of range function).
+        blocks_x = -(-width // block_width)
+        blocks_y = -(-(height - floor_start) // block_height)
+        for block in prange(blocks_x * blocks_y):
+            first_k = (block % blocks_x) * block_width
+            first_l = floor_start + (block // blocks_x) * block_height
+            for l in range(first_l, min(first_l + block_height, height)):
+                j = l * pixel_step
+                for k in range(first_k, min(first_k + block_width, width)):
+                    i = k * pixel_step
+
+                    # Let us imagine that the floor texture is tiled infinitely 
+                    # in both horizontal and vertical direction on a 2D plane.
+                    # Let us assume that this plane's horizontal and vertical axes
+                    # are labeled with px and py, respectively.
+                    # Furthermore assume that the screen's horizontal and vertical axes 
+                    # are labeled with x and z, respectively,
+                    # while y is an imaginary axis coming out of the screen.
+                    #
+                    # Idea: to emulate the mode-7 effect, compute which pixel of the floor texture 
+                    # is over the pixel (i, j) of the screen in this frame
                 
-                # First step: compute the raw x, y, z coordinates
-                # without mode-7 style projection.
-                #
-                # We adjust the x coordinate so the texture is at the center of the screen.
-                # Furthermore, the depth coordinate (y) is always shifted by the focal length of the camera.
-                # Lastly, we need to add a small constant to the screen height coordinate (z)
-                # to prevent divide-by-0 errors in the next step.
-                x = HALF_WIDTH - i  
-                y = j + FOCAL_LEN 
-                z = j - horizon + 0.01 
-
-                # Apply player's rotation (which is computed from the angle they are rotated by),
-                # "standard formula for rotation in 2D space".
-                rx = x * cos + y * sin
-                ry = x * -sin + y * cos
+                    # First step: compute the raw x, y coordinates
+                    # without mode-7 style projection.
+                    #
+                    # We adjust the x coordinate so the texture is at the center of the screen.
+                    # Furthermore, the depth coordinate (y) is always shifted by the focal length of the camera.
+                    # The screen height coordinate (z) only depends on the row,
+                    # its inverse is looked up in the precomputed table.
+                    x = HALF_WIDTH - i  
+                    y = j + FOCAL_LEN 
+                    inv_z = row_inv_depth[j]
 
-                # Apply mode-7 style projection.
-                # Camera position is used as offset here to allow movement
-                px = (rx / z + pos[1]) * SCALE
-                py = (ry / z + pos[0]) * SCALE
+                    # Apply player's rotation (which is computed from the angle they are rotated by),
+                    # "standard formula for rotation in 2D space".
+                    rx = x * cos + y * sin
+                    ry = x * -sin + y * cos
 
-                # Compute which pixel of the floor texture is over the point (i, j)
-                floor_pos = int(px % floor_tex_size[0]), int(py % floor_tex_size[1])
+                    # Apply mode-7 style projection.
+                    # Camera position is used as offset here to allow movement.
+                    # The texture coordinates are scaled down to the mip level sampled in this row.
+                    level = row_mip_level[j]
+                    px = (rx * inv_z + pos[1]) * SCALE * row_mip_scale[j]
+                    py = (ry * inv_z + pos[0]) * SCALE * row_mip_scale[j]
 
-                # look up the respective color in the floor array
-                floor_col = floor_array[floor_pos]
+                    # Compute which pixel of the floor texture is over the point (i, j)
+                    # and look up the respective color in the floor array.
+                    # (The modulo of a tiny negative coordinate rounds up to the texture size,
+                    # which would be read out of bounds.)
+                    level_width, level_height = floor_level_sizes[level, 0], floor_level_sizes[level, 1]
+                    floor_col = fetch_texel(
+                        floor_levels[level],
+                        min(int(px % level_width), level_width - 1),
+                        min(int(py % level_height), level_height - 1)
+                    )
 
-                # To prevent ugly artifacts at the horizon:
-                # compute some attenuation coefficient in the interval [0, 1] based on the "depth" value
-                attenuation = min(max(7.5 * (abs(z) / HALF_HEIGHT), 0), 1)
+                    # apply attenuation coefficient and optional fog effect of this row
+                    # and fill the computed pixel into the screen array
+                    screen_array[k, l] = shade_texel(floor_col, row_attenuation[j], row_fog[j], pixel_shifts)
 
-                # Compute a fog effect depending on whether the rendered scene is foggy.
-                fog = (1 - attenuation) * FOG_DENSITY if is_foggy else 0
-                
-                # apply attenuation and optional fog effect (component-wise, to color vector)
-                floor_col = (floor_col[0] * attenuation + fog,
-                    floor_col[1] * attenuation + fog,
-                    floor_col[2] * attenuation + fog)
+        return screen_array
+
+    # Computes a single frame of the mode-7 floor row by row (scanline renderer).
+    # Produces the same frame as render_frame (up to one texel of rounding differences) 
+    # and takes the same parameters.
+    #
+    # For a fixed screen row j, the depth is constant 
+    # and the rotated coordinates change linearly with the column i.
+    # Thus, the floor texture coordinates are also linear in i:
+    # it suffices to compute the texel for the first column of the row 
+    # as well as the step between two neighbouring columns once per row 
+    # and walk along the row by addition 
+    # (this is how the mode-7 hardware of the Super Nintendo works).
+    # If the row is split into several blocks, the walk starts over at the first column of every block.
+    @staticmethod
+    @njit(fastmath=True, parallel=True, nogil=True, cache=JIT_CACHE)
+    def render_frame_scanline(floor_levels, floor_level_sizes, screen_array, 
+        row_inv_depth, row_attenuation, row_fog, row_mip_level, row_mip_scale, pixel_shifts, pos, angle, horizon,
+        width, height, pixel_step, block_width, block_height):
+        sin, cos = numpy.sin(angle), numpy.cos(angle)
+
+        # first row of the screen array that shows the floor
+        floor_start = -(-horizon // pixel_step)
+
+        # prange over the blocks of the floor rows, as in render_frame
+        blocks_x = -(-width // block_width)
+        blocks_y = -(-(height - floor_start) // block_height)
+        for block in prange(blocks_x * blocks_y):
+            first_k = (block % blocks_x) * block_width
+            first_l = floor_start + (block // blocks_x) * block_height
+            for l in range(first_l, min(first_l + block_height, height)):
+                j = l * pixel_step
 
-                # fill the computed pixel into the screen array
-                screen_array[i, j] = floor_col
+                y = j + FOCAL_LEN
+                inv_z = row_inv_depth[j]
+                attenuation = row_attenuation[j]
+                fog = row_fog[j]
+
+                # mip level sampled in this row and its size
+                floor_array = floor_levels[row_mip_level[j]]
+                mip_scale = row_mip_scale[j]
+                floor_tex_size = floor_level_sizes[row_mip_level[j]]
+
+                # Texel over the first pixel (i, j) of the row in this block.
+                # Same computation as in render_frame with x = HALF_WIDTH - i.
+                x = HALF_WIDTH - first_k * pixel_step
+                rx = x * cos + y * sin
+                ry = x * -sin + y * cos
+                px = ((rx * inv_z + pos[1]) * SCALE * mip_scale) % floor_tex_size[0]
+                py = ((ry * inv_z + pos[0]) * SCALE * mip_scale) % floor_tex_size[1]
+
+                # Change of the texture coordinates from one rendered column to the next
+                # (x decreases by pixel_step with every column).
+                step_px = -cos * inv_z * SCALE * mip_scale * pixel_step
+                step_py = sin * inv_z * SCALE * mip_scale * pixel_step
+
+                for k in range(first_k, min(first_k + block_width, width)):
+                    # Look up the respective color in the floor array.
+                    # The clamp guards against float rounding at the border:
+                    # the wrap below (and the modulo above) can give exactly the texture size for tiny negative values.
+                    floor_col = fetch_texel(
+                        floor_array,
+                        min(int(px), floor_tex_size[0] - 1),
+                        min(int(py), floor_tex_size[1] - 1)
+                    )
+
+                    # apply attenuation and optional fog effect
+                    screen_array[k, l] = shade_texel(floor_col, attenuation, fog, pixel_shifts)
+
+                    # step to the texel of the next column,
+                    # wrapping around at the texture borders (texture is tiled infinitely)
+                    px += step_px
+                    py += step_py
+                    while px >= floor_tex_size[0]:
+                        px -= floor_tex_size[0]
+                    while px < 0:
+                        px += floor_tex_size[0]
+                    while py >= floor_tex_size[1]:
+                        py -= floor_tex_size[1]
+                    while py < 0:
+                        py += floor_tex_size[1]
 
         return screen_array
 
     def draw(self):
         # Draws the screen contents that were computed in the render_frame method.
         #
-        # Copies values from the array representing the screen 
-        # into the surface representing the screen.
-        # This surface is automatically rendered by pygame.
-        pygame.surfarray.blit_array(self.app.screen, self.screen_array)
+        # When rendering directly into the render surface, the frame is already there.
+        # Otherwise, copies values from the array representing the screen 
+        # into the render surface.
+        if not self.zero_copy:
+            pygame.surfarray.blit_array(self.render_surface, self.screen_array)
+
+        # At a reduced internal resolution, the frame is scaled up onto the display surface
+        # (which is automatically rendered by pygame).
+        if self.pixel_step > 1:
+            if self.scaled_surface is None:
+                pygame.transform.scale(self.render_surface, WIN_RES, self.app.screen)
+            else:
+                pygame.transform.scale(self.render_surface, self.scaled_surface.get_size(), self.scaled_surface)
+                self.app.screen.blit(self.scaled_surface, (0, 0))
@@ -2,15 +2,17 @@ import numpy
 import pygame
 
 from settings.debug_settings import IN_DEV_MODE, COLLISION_DETECTION_OFF # debug config
-from settings.key_settings import STD_ACCEL_KEY, STD_LEFT_KEY, STD_RIGHT_KEY, STD_BRAKE_KEY, STD_BOOST_KEY # button mapping config
 from settings.renderer_settings import NORMAL_ON_SCREEN_PLAYER_POSITION_X, NORMAL_ON_SCREEN_PLAYER_POSITION_Y # rendering config
 from settings.machine_settings import PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT # player collider config
 from settings.machine_settings import HEIGHT_DURING_JUMP, HIT_COST_SPEED_FACTOR, MIN_BOUNCE_BACK_FORCE
 from settings.machine_settings import OBSTACLE_HIT_SPEED_RETENTION 
 
 from collision import CollisionRect
+from track import DASH_PLATE_FLAG, RAMP_FLAG, RECOVERY_ZONE_FLAG
 
 from animation import AnimatedMachine
+from assets import load_image
+from controls import InputState
 
 class Player(pygame.sprite.Sprite, AnimatedMachine):
     # Constructor.
@@ -54,7 +56,7 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
         # Create a new sprite object for the machine shadow
         # which remains fixed all the time.
         self.shadow_sprite = pygame.sprite.Sprite()
-        self.shadow_sprite.image = pygame.image.load(self.machine.shadow_image_path)
+        self.shadow_sprite.image = load_image(self.machine.shadow_image_path) # cached after the first race
         self.shadow_sprite.rect = self.shadow_sprite.image.get_rect()
         # shadow sprite is created in a way that it is fine if player + shadow are at same screen coordinates
         self.shadow_sprite.rect.topleft = [NORMAL_ON_SCREEN_PLAYER_POSITION_X, NORMAL_ON_SCREEN_PLAYER_POSITION_Y]
@@ -77,12 +79,16 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
     # 
     # Parameters:
     # time: number of frames since the game started
-    def update(self, time, delta):
+    # delta: the time between this frame and the previous frame
+    # inputs: state of the racing controls in this frame (InputState), read from the keyboard if None
+    def update(self, time, delta, inputs = None):
         # move player according to steering inputs and current speed
         if IN_DEV_MODE:
             self.dev_mode_movement()
         elif not self.destroyed:
-            self.racing_mode_movement(time, delta)
+            if inputs is None:
+                inputs = InputState.from_keyboard()
+            self.racing_mode_movement(time, delta, inputs)
 
         # Store the current rectangular collider of the player
         # for use in several environment checks and updates.
@@ -96,16 +102,19 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
         # To do so, the track object needs the current position of the player.
         self.current_race.update_lap_count(current_collision_rect)
 
+        # Look up all surfaces the player is currently on at once.
+        surface_flags = self.current_race.surface_flags(current_collision_rect)
+
         # Make player boost if on dash plate.
         # Jumping over a dash plate of course does not lead to a boost.
-        if self.current_race.is_on_dash_plate(current_collision_rect) and not self.jumping and not self.boosted:
+        if surface_flags & DASH_PLATE_FLAG and not self.jumping and not self.boosted:
             self.boosted = True
             self.last_boost_started_timestamp = time # timestamp for determining when the boost should end
         if self.boosted:
             self.continue_boost(time)
 
         # Make player jump if on ramp.
-        if self.current_race.is_on_ramp(current_collision_rect) and not self.jumping:
+        if surface_flags & RAMP_FLAG and not self.jumping:
             self.jumping = True # set status flag
             self.current_jump_duration = self.machine.jump_duration_multiplier * self.current_speed # compute duration of jump based on speed
             self.jumped_off_timestamp = time # timestamp for computing height in later frames
@@ -114,7 +123,7 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
 
         # Make player recover energy if in recovery zone.
         # Jumping over a recovery zone of course does not count.
-        if self.current_race.is_on_recovery_zone(current_collision_rect) and not self.jumping:
+        if surface_flags & RECOVERY_ZONE_FLAG and not self.jumping:
             self.current_energy += self.machine.recover_speed * delta
             if self.current_energy > self.machine.max_energy:
                 self.current_energy = self.machine.max_energy
@@ -174,18 +183,16 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
     # Parameters:
     # time - the timestamp of the frame update in which this call was made
     # delta - the time between this frame and the previous frame
-    def racing_mode_movement(self, time, delta):
-        # collect key events
-        keys = pygame.key.get_pressed()
-
+    # inputs - state of the racing controls in this frame (InputState)
+    def racing_mode_movement(self, time, delta, inputs):
         # determine whether the player intends to start a boost in this frame
-        if keys[STD_BOOST_KEY] and self.can_boost():
+        if inputs.boost and self.can_boost():
             self.last_boost_started_timestamp = time # take timestamp
             self.current_energy -= self.machine.boost_cost # boosting costs a bit of energy
             self.boosted = True # status flag update
 
         # Steering.
-        if keys[STD_LEFT_KEY] and not self.finished:
+        if inputs.left and not self.finished:
             # update flags
             self.steering_left = True
             self.steering_right = False
@@ -193,7 +200,7 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
             # rotate player
             self.angle += self.machine.rotation_speed * delta
             
-        if keys[STD_RIGHT_KEY] and not self.finished:
+        if inputs.right and not self.finished:
             # update flags
             self.steering_left = False
             self.steering_right = True
@@ -206,7 +213,7 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
         # Increase speed when acceleration button pressed.
         # Acceleration input should be ignored when the speed currently is above the machine's current max speed.
         current_max_speed = self.machine.boosted_max_speed if self.boosted else self.machine.max_speed
-        if keys[STD_ACCEL_KEY] and not self.finished and not self.current_speed > current_max_speed:
+        if inputs.accelerate and not self.finished and not self.current_speed > current_max_speed:
             # switch to driving animation
             self.switch_to_driving_animation()
 
@@ -216,7 +223,7 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
             ) * delta
         # Decrease speed heavily when brake button pressed.
         # The player cannot brake when mid-air.
-        elif keys[STD_BRAKE_KEY] and not self.finished and not self.jumping:
+        elif inputs.brake and not self.finished and not self.jumping:
             # no matter whether player moves forwards or backwards:
             # transition to idle animation when player brakes
             self.switch_to_idle_animation()
@@ -274,7 +281,7 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
         # If the player presses one of the turn buttons in the current frame,
         # the centrifugal force increases (is capped at a certain limit)
         # The increase in centrifugal forces is proportional to the player's current speed.
-        if keys[STD_LEFT_KEY] or keys[STD_RIGHT_KEY]:
+        if inputs.left or inputs.right:
             self.centri += self.machine.centri_increase * self.current_speed * delta
             if self.centri > self.machine.max_centri:
                 self.centri = self.machine.max_centri
@@ -495,6 +502,16 @@ class Player(pygame.sprite.Sprite, AnimatedMachine):
         self.position = numpy.array([self.current_race.init_player_pos_x, self.current_race.init_player_pos_y])
         self.angle = self.current_race.init_player_angle
 
+    # Updates the status flags of the player that depend on their progress in the current race:
+    # the player has finished once they completed the required laps
+    # and can use their booster after completing the first lap.
+    def update_race_progress(self):
+        if self.current_race.player_finished_race() and not self.finished:
+            self.finished = True
+
+        if self.current_race.player_completed_first_lap() and not self.has_boost_power:
+            self.has_boost_power = True
+
     # Destroys the player machine by updating a status flag
     # and playing the explosion animation.
     def destroy(self):
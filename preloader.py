@@ -0,0 +1,114 @@
+# Module for loading the assets of upcoming races in the background.
+#
+# While a race is running, the assets of the next race (floor/background textures, music)
+# are already known. Loading them on a worker thread during the current race
+# turns loading the next race into little more than swapping references.
+
+import io
+import os
+import threading
+import traceback
+
+from mode7 import Mode7
+
+# Loads the textures, music and track of races on a background thread.
+# Textures end up in the texture cache (see texture module),
+# music files are read into memory and kept in this preloader until they are played (see music_file),
+# the collision map of the track is cached in the race object.
+class AssetPreloader:
+    def __init__(self):
+        # contents of the preloaded music files, keyed by file path
+        self.music_data = {}
+
+        # the worker thread that is currently loading assets (None if no loading is in progress),
+        # the race it is loading and the race (and screen) that it loads next (None if no further race is requested)
+        self.worker = None
+        self.loading_race = None
+        self.pending = None
+
+        # guards the fields above (accessed from the worker thread and the game loop)
+        self.lock = threading.Lock()
+
+    # Requests loading the assets of the passed race on a background thread.
+    # Never blocks the game loop: if another race is being loaded, the passed race is loaded after it
+    # (replacing an earlier request that has not been started yet).
+    # Requests for the race that is currently being loaded are ignored.
+    #
+    # Parameters:
+    # race - the race whose assets should be loaded
+    # screen - display surface that the race will be rendered onto (determines the texture format)
+    def preload(self, race, screen):
+        with self.lock:
+            if race is self.loading_race:
+                return
+
+            self.pending = (race, screen)
+
+            # only one race is loaded at a time, a running worker picks up the request when it is done
+            if self.worker is None:
+                self.worker = threading.Thread(
+                    target = self.run,
+                    daemon = True # must not keep the process alive when the game is closed
+                )
+                self.worker.start()
+
+    # Blocks until all requested preloads (if any) are done.
+    def wait(self):
+        with self.lock:
+            worker = self.worker
+        if worker is not None:
+            worker.join()
+
+    # Runs on the worker thread: loads the requested races one after the other until no request is left.
+    def run(self):
+        while True:
+            with self.lock:
+                if self.pending is None:
+                    self.worker = None
+                    self.loading_race = None
+                    return
+                race, screen = self.pending
+                self.pending = None
+                self.loading_race = race
+
+            # Preloading is only an optimization (the game loads whatever is missing when the race starts),
+            # so a failing preload must not stop the worker.
+            try:
+                self.load_race_assets(race, screen)
+            except Exception:
+                traceback.print_exc()
+
+    # Runs on the worker thread:
+    # decodes the textures of the passed race into renderer-ready arrays, reads its music file
+    # and creates the collision map of its track.
+    def load_race_assets(self, race, screen):
+        # accessing the track of the race creates its collision map (which is cached by the race)
+        race.race_track
+
+        Mode7.load_textures(
+            screen = screen,
+            floor_tex_path = race.floor_texture_path,
+            bg_tex_path = race.bg_texture_path
+        )
+
+        with self.lock:
+            if race.music_track_path in self.music_data:
+                return
+
+        with open(race.music_track_path, "rb") as music_file:
+            data = music_file.read()
+
+        with self.lock:
+            self.music_data[race.music_track_path] = data
+
+    # Returns the music file under the passed path in a form that can be passed to mixer.music.load:
+    # an in-memory file if the music was preloaded, the path otherwise.
+    # Also returns the name hint (file extension) that the mixer needs to decode in-memory files.
+    # The preloaded music is handed over to the caller (and no longer kept in this preloader).
+    def music_file(self, path):
+        with self.lock:
+            data = self.music_data.pop(path, None)
+
+        if data is None:
+            return path, ""
+        return io.BytesIO(data), os.path.splitext(path)[1][1:]
@@ -0,0 +1,151 @@
+# Module for profiling the stages of every frame of the game.
+#
+# The time spent on every stage of a frame (handling events, updating the player, rendering, ...)
+# is measured with a monotonic high-resolution clock and stored in a ring buffer of the recent frames.
+# While profiling, an overlay shows the average time of every stage compared to the frame budget.
+# When the game is closed, the percentiles of the recorded stage times are printed.
+#
+# Profiling is toggled with the profiler key (see key settings).
+
+import time
+import numpy
+import pygame
+
+from settings.debug_settings import PROFILER_HISTORY_FRAMES, PROFILER_OVERLAY_FRAMES
+
+# Stages of a frame in the order in which they run.
+PROFILER_STAGES = [
+    "events", # App.check_event
+    "player", # Player.update
+    "camera", # Camera.update
+    "mode7 update", # Mode7.update (render kernel)
+    "mode7 draw", # Mode7.draw (presentation of the rendered frame)
+    "sprites", # drawing the billboards and sprite groups
+    "flip" # pygame.display.flip
+]
+
+# colors of the bars of the stages in the overlay
+PROFILER_STAGE_COLORS = [
+    (230, 230, 230), (80, 160, 255), (80, 220, 220), (255, 80, 80), (255, 160, 60), (120, 220, 80), (200, 120, 255)
+]
+
+# Context manager that adds the time spent in its block to a stage of the current frame.
+class StageTimer:
+    def __init__(self, profiler, stage_index):
+        self.profiler = profiler
+        self.stage_index = stage_index
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exception):
+        self.profiler.current_frame[self.stage_index] += time.perf_counter() - self.start
+
+# Context manager that does nothing (used while not profiling).
+class NoTimer:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exception):
+        pass
+
+NO_TIMER = NoTimer()
+
+class FrameProfiler:
+    # Parameters:
+    # target_fps - frame rate that the game should hold (its inverse is the frame budget shown in the overlay)
+    # enabled - whether profiling is active from the start
+    def __init__(self, target_fps, enabled = False):
+        self.frame_budget = 1 / target_fps
+        self.enabled = enabled
+
+        # Ring buffer of the stage times (in seconds) of the recent frames (one row per frame).
+        # The row of the n-th recorded frame is n % PROFILER_HISTORY_FRAMES.
+        self.frame_times = numpy.zeros((PROFILER_HISTORY_FRAMES, len(PROFILER_STAGES)))
+        self.recorded_frames = 0
+
+        # stage times of the frame that is currently running
+        self.current_frame = numpy.zeros(len(PROFILER_STAGES))
+
+        self.timers = {name: StageTimer(self, index) for index, name in enumerate(PROFILER_STAGES)}
+
+        # font of the overlay (created when the overlay is drawn for the first time)
+        self.font = None
+
+    # Turns profiling on or off.
+    # Frames recorded before are kept (and reported).
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.current_frame[:] = 0
+
+    # Returns a context manager that measures the stage with the passed name, e.g.:
+    # with profiler.stage("player"):
+    #     player.update(...)
+    def stage(self, name):
+        return self.timers[name] if self.enabled else NO_TIMER
+
+    # Ends the current frame and stores its stage times in the ring buffer.
+    # Called once per frame after all stages have run.
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.frame_times[self.recorded_frames % PROFILER_HISTORY_FRAMES] = self.current_frame
+        self.recorded_frames += 1
+        self.current_frame[:] = 0
+
+    # Returns the stage times of the last recorded frames (up to the passed number of frames), oldest first.
+    def recent_frames(self, count = PROFILER_HISTORY_FRAMES):
+        count = min(count, self.recorded_frames, PROFILER_HISTORY_FRAMES)
+        indices = numpy.arange(self.recorded_frames - count, self.recorded_frames) % PROFILER_HISTORY_FRAMES
+        return self.frame_times[indices]
+
+    # Draws the overlay onto the passed surface:
+    # one bar per stage showing its average time over the last PROFILER_OVERLAY_FRAMES frames
+    # and a bar for the whole frame with the frame budget marked.
+    def draw_overlay(self, surface):
+        if not self.enabled or self.recorded_frames == 0:
+            return
+
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 14)
+
+        averages = self.recent_frames(PROFILER_OVERLAY_FRAMES).mean(axis = 0)
+
+        # the whole width of the bars corresponds to twice the frame budget
+        left, top, row_height, bar_width = 4, 4, 10, 120
+        pixels_per_second = bar_width / (2 * self.frame_budget)
+
+        background = pygame.Surface((bar_width + 110, row_height * (len(PROFILER_STAGES) + 1) + 4), pygame.SRCALPHA)
+        background.fill((0, 0, 0, 160))
+        surface.blit(background, (left - 2, top - 2))
+
+        labels = PROFILER_STAGES + ["frame"]
+        bar_colors = PROFILER_STAGE_COLORS + [(255, 255, 255)]
+        times = list(averages) + [averages.sum()]
+        for row, (label, color, stage_time) in enumerate(zip(labels, bar_colors, times)):
+            y = top + row * row_height
+            text = self.font.render(label + " " + format(stage_time * 1000, ".2f"), True, color)
+            surface.blit(text, (left, y))
+            width = min(bar_width, round(stage_time * pixels_per_second))
+            pygame.draw.rect(surface, color, pygame.Rect(left + 100, y + 2, width, row_height - 4))
+
+        # the frame budget is in the middle of the bars
+        budget_x = left + 100 + bar_width // 2
+        pygame.draw.line(surface, (255, 255, 0), (budget_x, top), (budget_x, top + row_height * len(labels)))
+
+    # Returns the report of the recorded frames as text:
+    # the 50th, 95th and 99th percentiles of the times (in milliseconds) of every stage and of the whole frames.
+    def report(self):
+        frames = self.recent_frames()
+        if len(frames) == 0:
+            return "no frames profiled"
+
+        columns = numpy.column_stack([frames, frames.sum(axis = 1)]) * 1000
+        percentiles = numpy.percentile(columns, [50, 95, 99], axis = 0)
+
+        lines = ["profile of the last " + str(len(frames)) + " frames (ms):", "stage".ljust(14) + "p50".rjust(8) + "p95".rjust(8) + "p99".rjust(8)]
+        for index, label in enumerate(PROFILER_STAGES + ["frame"]):
+            lines.append(label.ljust(14) + "".join(format(value, ".3f").rjust(8) for value in percentiles[:, index]))
+        return "\n".join(lines)
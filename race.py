@@ -1,3 +1,9 @@
+import os
+import threading
+
+from settings.collision_settings import USE_SURFACE_RASTER, SURFACE_RASTER_CELLS_PER_UNIT, SURFACE_RASTER_MAX_CELLS
+from settings.machine_settings import PLAYER_COLLISION_RECT_WIDTH, PLAYER_COLLISION_RECT_HEIGHT
+
 # A data class holding all data that belongs to a race.
 # This includes:
 # - file paths to floor and background sprites
@@ -8,8 +14,13 @@
 class Race:
     def __init__(self, race_track_creator, floor_tex_path, bg_tex_path, required_laps, 
             init_player_pos_x, init_player_pos_y, init_player_angle, is_foggy, race_mode, music_track_path):
-        # create collision map for played track using the passed function
-        self.race_track = race_track_creator()
+        # Function that creates the collision map for the played track.
+        # The collision map is only created when the race is first loaded (see race_track).
+        self.race_track_creator = race_track_creator
+        self.created_race_track = None
+
+        # guards the creation of the collision map (the asset preloader creates it on its worker thread)
+        self.race_track_lock = threading.Lock()
         
         # environment textures
         self.floor_texture_path = floor_tex_path
@@ -31,6 +42,32 @@ class Race:
 
         self.music_track_path = music_track_path
 
+    # Collision map of the track played in this race.
+    # Created using the race track creator function on first access 
+    # (so that defining races does not build all tracks up front) and cached afterwards.
+    #
+    # If enabled, the surfaces of the track are baked into a raster for the player collider,
+    # which is cached in a file next to the floor texture.
+    #
+    # The collision map is created only once, even if the game loop and the asset preloader access it at the same time
+    # (the second thread waits for the first one).
+    @property
+    def race_track(self):
+        if self.created_race_track is None:
+            with self.race_track_lock:
+                if self.created_race_track is None:
+                    race_track = self.race_track_creator()
+                    if USE_SURFACE_RASTER:
+                        race_track.bake_surface_raster(
+                            collider_width = PLAYER_COLLISION_RECT_WIDTH,
+                            collider_height = PLAYER_COLLISION_RECT_HEIGHT,
+                            cells_per_unit = SURFACE_RASTER_CELLS_PER_UNIT,
+                            max_cells = SURFACE_RASTER_MAX_CELLS,
+                            cache_path = os.path.splitext(self.floor_texture_path)[0] + ".collision.npz"
+                        )
+                    self.created_race_track = race_track
+        return self.created_race_track
+
     # Returns True if and only if the registered player 
     # has finished the race on this track 
     # (i.e. finished the required number of laps).  
@@ -81,6 +118,9 @@ class Race:
     def is_on_ramp(self, other):
         return self.race_track.is_on_ramp(other)
 
+    def surface_flags(self, other):
+        return self.race_track.surface_flags(other)
+
     def guard_rails_active(self):
         return self.race_track.guard_rails_active()
 
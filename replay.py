@@ -0,0 +1,200 @@
+# Module for recording the inputs of a race and replaying them.
+#
+# A replay stores the racing controls (see InputState) and the frame delta of every frame of a race.
+# Since the physics of the player only depend on these (and the race clock derived from the deltas, see App.update),
+# replaying them reproduces the exact trajectory and lap count of the recorded race.
+# Replays can be played back headless (much faster than real time, see Replay.simulate)
+# or with rendering (see App).
+#
+# Replay files are binary and consist of a fixed-size header followed by the zlib-compressed frames.
+# Every frame is stored as a single unsigned LEB128 varint holding
+# the difference between its delta and the previous frame's delta (in microseconds, zigzag encoded)
+# shifted left by 5 bits, and the 5 input bits in the lowest bits.
+# At a steady frame rate, most frames take only one or two bytes (before compression).
+#
+# Usage: python replay.py FILE [--render]
+
+import argparse
+import struct
+import zlib
+
+from controls import InputState
+from simulation import Simulation
+
+from settings.machine_settings import MACHINES
+from settings.league_settings import SINGLE_MODE_RACES
+
+# magic bytes at the start of every replay file and version of the file format
+REPLAY_MAGIC = b"FZRP"
+REPLAY_VERSION = 1
+
+# Header layout: magic, version, race index (in SINGLE_MODE_RACES), machine index (in MACHINES),
+# number of frames, completed laps and race time (in microseconds) at the end of the recording.
+REPLAY_HEADER = struct.Struct("<4sBBBIBq")
+
+# bit of each control in the input bits of a frame
+ACCELERATE_BIT = 1
+BRAKE_BIT = 2
+BOOST_BIT = 4
+LEFT_BIT = 8
+RIGHT_BIT = 16
+NUM_INPUT_BITS = 5
+
+class Replay:
+    # Parameters:
+    # race_index - index of the recorded race in SINGLE_MODE_RACES
+    # machine_index - index of the recorded machine in MACHINES
+    def __init__(self, race_index, machine_index):
+        self.race_index = race_index
+        self.machine_index = machine_index
+
+        # per frame: input bits and delta (in microseconds)
+        self.input_bits = []
+        self.deltas = []
+
+        # state at the end of the recording (used to validate replays, e.g. leaderboard times)
+        self.completed_laps = 0
+        self.race_time = 0
+
+    # Creates an empty replay for the passed race and machine.
+    @staticmethod
+    def for_race(race, machine):
+        return Replay(SINGLE_MODE_RACES.index(race), MACHINES.index(machine))
+
+    # Returns the number of recorded frames.
+    def length(self):
+        return len(self.deltas)
+
+    # Records a frame with the passed inputs (InputState) and delta (in microseconds).
+    def append(self, inputs, delta_microseconds):
+        self.input_bits.append(
+            (ACCELERATE_BIT if inputs.accelerate else 0)
+            | (BRAKE_BIT if inputs.brake else 0)
+            | (BOOST_BIT if inputs.boost else 0)
+            | (LEFT_BIT if inputs.left else 0)
+            | (RIGHT_BIT if inputs.right else 0)
+        )
+        self.deltas.append(delta_microseconds)
+        self.race_time += delta_microseconds
+
+    # Yields the inputs (InputState), delta and race time (in seconds) of every recorded frame,
+    # computed in the same way as the race clock of the game (see App.update).
+    # The tuples can be passed to Simulation.step as they are.
+    def frames(self):
+        race_clock = 0
+        for bits, delta_microseconds in zip(self.input_bits, self.deltas):
+            race_clock += delta_microseconds
+            inputs = InputState(
+                accelerate = bool(bits & ACCELERATE_BIT),
+                brake = bool(bits & BRAKE_BIT),
+                boost = bool(bits & BOOST_BIT),
+                left = bool(bits & LEFT_BIT),
+                right = bool(bits & RIGHT_BIT)
+            )
+            yield inputs, delta_microseconds / 1000000, race_clock / 1000000
+
+    # Plays the replay back without rendering and returns the simulation after the last frame.
+    def simulate(self):
+        simulation = Simulation(MACHINES[self.machine_index], SINGLE_MODE_RACES[self.race_index])
+        for frame in self.frames():
+            simulation.step(*frame)
+        return simulation
+
+    # Plays the replay back without rendering and returns True if and only if
+    # the player finishes the race with the recorded number of completed laps
+    # exactly at the recorded race time (the last frame of the recording, see App.update),
+    # e.g. to validate a leaderboard time.
+    def verify(self):
+        return self.verify_simulation(self.simulate())
+
+    # Returns True if and only if the passed simulation of this replay (see simulate)
+    # reproduces the recorded race (see verify).
+    def verify_simulation(self, simulation):
+        return (simulation.player.finished
+            and simulation.race.player_completed_laps == self.completed_laps
+            and len(simulation.lap_completion_times) > 0
+            and round(simulation.lap_completion_times[-1] * 1000000) == self.race_time
+            and round(simulation.time * 1000000) == self.race_time)
+
+    # Writes the replay to the file under the passed path.
+    def save(self, path):
+        data = bytearray()
+        previous_delta = 0
+        for bits, delta_microseconds in zip(self.input_bits, self.deltas):
+            difference = delta_microseconds - previous_delta
+            previous_delta = delta_microseconds
+
+            # zigzag encoding maps small negative and positive differences to small unsigned numbers
+            value = ((difference << 1) ^ (difference >> 63)) & 0xFFFFFFFFFFFFFFFF
+            value = (value << NUM_INPUT_BITS) | bits
+
+            # LEB128: 7 bits per byte, high bit set on all but the last byte
+            while value >= 0x80:
+                data.append((value & 0x7F) | 0x80)
+                value >>= 7
+            data.append(value)
+
+        with open(path, "wb") as file:
+            file.write(REPLAY_HEADER.pack(
+                REPLAY_MAGIC, REPLAY_VERSION, self.race_index, self.machine_index,
+                self.length(), self.completed_laps, self.race_time
+            ))
+            file.write(zlib.compress(bytes(data), 9))
+
+    # Reads the replay from the file under the passed path.
+    # Raises a ValueError if the file is not a replay file of a supported version.
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as file:
+            content = file.read()
+
+        magic, version, race_index, machine_index, num_frames, completed_laps, race_time = REPLAY_HEADER.unpack_from(content)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("not a replay file of version " + str(REPLAY_VERSION) + ": " + path)
+
+        replay = Replay(race_index, machine_index)
+        data = zlib.decompress(content[REPLAY_HEADER.size:])
+
+        position = 0
+        previous_delta = 0
+        for _ in range(num_frames):
+            value, shift = 0, 0
+            while True:
+                byte = data[position]
+                position += 1
+                value |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+
+            zigzag = value >> NUM_INPUT_BITS
+            previous_delta += (zigzag >> 1) ^ -(zigzag & 1)
+            replay.input_bits.append(value & ((1 << NUM_INPUT_BITS) - 1))
+            replay.deltas.append(previous_delta)
+
+        replay.completed_laps = completed_laps
+        replay.race_time = race_time
+        return replay
+
+def main():
+    parser = argparse.ArgumentParser(description = "Plays back a replay file.")
+    parser.add_argument("file", help = "replay file")
+    parser.add_argument("--render", action = "store_true", help = "play the replay back in the game window instead of headless")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.file)
+
+    if args.render:
+        # imported here since the game window is only needed for rendered playback
+        from main import App
+        App(replay = replay).run()
+        return
+
+    simulation = replay.simulate()
+    print(str(replay.length()) + " frames, " + str(simulation.race.player_completed_laps) + " laps completed"
+        + (", finished in " + str(simulation.lap_completion_times[-1]) + " s" if simulation.player.finished else ", not finished")
+        + " (recorded: " + str(replay.completed_laps) + " laps in " + str(replay.race_time / 1000000) + " s)")
+    print("replay is valid" if replay.verify_simulation(simulation) else "replay is INVALID")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# Module for the dynamic resolution of the Mode7 renderer.
+#
+# When the game cannot keep up with TARGET_FPS (e.g. on weaker hardware),
+# the floor is rendered at a lower internal resolution and scaled up to the window resolution
+# (see Mode7.set_pixel_step) instead of letting the game slow down.
+# As soon as there is enough headroom again, the resolution is raised step by step.
+
+import statistics
+from collections import deque
+
+from settings.renderer_settings import DYNAMIC_RESOLUTION_PIXEL_STEPS, DYNAMIC_RESOLUTION_WINDOW
+from settings.renderer_settings import DYNAMIC_RESOLUTION_LOWER_LOAD, DYNAMIC_RESOLUTION_RAISE_LOAD
+
+# Chooses the pixel step of the renderer from the frame times of the recent frames.
+class ResolutionController:
+    # Parameters:
+    # target_fps - frame rate that should be held (its inverse is the frame budget)
+    # pixel_steps - pixel steps to choose from, from highest to lowest resolution
+    def __init__(self, target_fps, pixel_steps = DYNAMIC_RESOLUTION_PIXEL_STEPS):
+        self.frame_budget = 1 / target_fps
+        self.pixel_steps = pixel_steps
+
+        # index of the current pixel step in pixel_steps (starts at the highest resolution)
+        self.level = 0
+
+        # rolling windows of the frame times and render times (in seconds) since the last change of the resolution
+        self.frame_times = deque(maxlen = DYNAMIC_RESOLUTION_WINDOW)
+        self.render_times = deque(maxlen = DYNAMIC_RESOLUTION_WINDOW)
+
+    # Returns the current pixel step.
+    def pixel_step(self):
+        return self.pixel_steps[self.level]
+
+    # Records the times of a frame (in seconds):
+    # frame_time - time spent on the whole frame (without waiting for the frame rate cap)
+    # render_time - part of it spent on rendering and drawing the Mode7 environment
+    # Returns True if and only if the pixel step has changed.
+    #
+    # Decisions are only made on a full window of frames, based on the medians
+    # (single slow frames, e.g. while loading a race, are ignored).
+    # After every change, the window starts over, so the effect of a change is measured before the next one.
+    def add_frame_time(self, frame_time, render_time):
+        self.frame_times.append(frame_time)
+        self.render_times.append(render_time)
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return False
+
+        frame_time = statistics.median(self.frame_times)
+        render_time = statistics.median(self.render_times)
+
+        # too slow: lower the resolution
+        if frame_time > self.frame_budget * DYNAMIC_RESOLUTION_LOWER_LOAD and self.level < len(self.pixel_steps) - 1:
+            return self.change_level(self.level + 1)
+
+        # Enough headroom: raise the resolution.
+        # The frame time at the higher resolution is estimated pessimistically
+        # as if the render time scaled with the number of rendered pixels
+        # (the time spent on scaling the frame up is counted as well although it is saved at full resolution).
+        if self.level > 0:
+            pixel_ratio = (self.pixel_steps[self.level] / self.pixel_steps[self.level - 1]) ** 2
+            expected_frame_time = frame_time + render_time * (pixel_ratio - 1)
+            if expected_frame_time < self.frame_budget * DYNAMIC_RESOLUTION_RAISE_LOAD:
+                return self.change_level(self.level - 1)
+
+        return False
+
+    # Switches to the pixel step with the passed index and starts a new window.
+    def change_level(self, level):
+        self.level = level
+        self.frame_times.clear()
+        self.render_times.clear()
+        return True
@@ -0,0 +1,25 @@
+# Settings for the collision detection.
+
+# Upper limit for the number of cells per axis of the uniform grids
+# that the tracks use to look up the collision rects near a collider.
+MAX_GRID_CELLS_PER_AXIS = 64
+
+# Number of cells per axis of a uniform grid per rect stored in the grid.
+# Tracks with more rects get finer grids (up to the upper limit above).
+GRID_CELLS_PER_RECT = 2
+
+# Rect lists with at most this many rects are not divided into a grid
+# since testing all of their rects is faster than looking up the grid cells.
+GRID_MIN_RECTS = 16
+
+# Whether the surfaces of a track (track surface, dash plates, ramps, ...) are baked into a raster 
+# when the track is loaded, so that surface queries for the player take a single array lookup.
+# The raster is cached in a file next to the floor texture of the race.
+USE_SURFACE_RASTER = True
+
+# resolution of the surface raster (cells per unit of length in the game world)
+SURFACE_RASTER_CELLS_PER_UNIT = 8
+
+# Upper limit for the number of cells of a surface raster.
+# For very large tracks, the resolution is lowered so that this limit is not exceeded.
+SURFACE_RASTER_MAX_CELLS = 4000000
@@ -27,4 +27,24 @@ DEFAULT_SINGLE_RACE_CHOICE = 1
 DEBUG_RESTART_RACE_ON_R = True
 
 # whether debug information should be logged to the standard output
-SHOULD_DEBUG_LOG = False
\ No newline at end of file
+SHOULD_DEBUG_LOG = False
+
+# Whether the inputs of every race are recorded and saved as a replay file (see replay module)
+# when the race is finished, restarted or the game is closed.
+RECORD_REPLAYS = False
+
+# directory that recorded replay files are saved to
+REPLAY_DIRECTORY = "replays"
+
+# whether the frame profiler (see profiler module) is running when the game starts
+# (can be toggled with the profiler key while playing)
+PROFILER_ENABLED = False
+
+# number of recent frames whose stage times the profiler keeps (and reports when the game is closed)
+PROFILER_HISTORY_FRAMES = 4096
+
+# number of recent frames that the stage times in the profiler overlay are averaged over
+PROFILER_OVERLAY_FRAMES = 60
+
+# whether the time from the start of the game until the first frame is displayed is printed (see App.report_startup_time)
+REPORT_STARTUP_TIME = True
@@ -0,0 +1,10 @@
+# Settings for the ghost machine in time-attack races (see ghost module).
+
+# whether the best lap of time-attack races is recorded and shown as a ghost machine
+GHOSTS_ENABLED = True
+
+# directory that the ghost trajectories (best laps) of the races are saved to
+GHOST_DIRECTORY = "ghosts"
+
+# opacity of the ghost machine (0: invisible, 255: opaque)
+GHOST_ALPHA = 110
@@ -10,4 +10,5 @@ STD_LEFT_KEY = pygame.K_a # A = steer left
 STD_RIGHT_KEY = pygame.K_d # D = steer right
 
 STD_CONFIRM_KEY = pygame.K_k # standard key to confirm choices in menus
-STD_DEBUG_RESTART_KEY = pygame.K_r # standard key to restart a race in debug mode
\ No newline at end of file
+STD_DEBUG_RESTART_KEY = pygame.K_r # standard key to restart a race in debug mode
+STD_PROFILER_KEY = pygame.K_F3 # standard key to toggle the frame profiler
@@ -6,6 +6,9 @@ from league import League
 from settings.track_settings import TrackCreator, STD_REQUIRED_LAPS
 from settings.music_settings import BGM_DICT
 
+# modes of the races (see Race.race_mode)
+TIME_ATTACK_RACE_MODE = "time-attack"
+
 # ------------- creation of the different leagues in the game --------------------------
 
 LEAGUE_1_RACES = [
@@ -14,7 +17,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/event_horizon_track1.png",
         bg_tex_path = "gfx/event_horizon_bg.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time-attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 25.55,
         init_player_pos_y = -119.78,
         init_player_angle = -111.565,
@@ -26,7 +29,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/track_2023.png",
         bg_tex_path = "gfx/track_2023_bg_resized.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time-attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 25.55,
         init_player_pos_y = -119.78,
         init_player_angle = -111.565,
@@ -38,7 +41,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/track_2023_II.png",
         bg_tex_path = "gfx/track_2023_bg_resized.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time-attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 25.55,
         init_player_pos_y = -119.78,
         init_player_angle = -111.565,
@@ -50,7 +53,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/event_horizon_track2.png",
         bg_tex_path = "gfx/event_horizon_bg.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time_attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 26.26,
         init_player_pos_y = -98.86,
         init_player_angle = -111.565,
@@ -62,7 +65,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/track_2023_snow.png",
         bg_tex_path = "gfx/track_2023_snow_bg.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time-attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 25.55,
         init_player_pos_y = -119.78,
         init_player_angle = -111.565,
@@ -74,7 +77,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/desert_track1.png",
         bg_tex_path = "gfx/monochrome_track_bg.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time_attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 25.55,
         init_player_pos_y = -119.78,
         init_player_angle = -111.565,
@@ -86,7 +89,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/monochrome_track.png",
         bg_tex_path = "gfx/monochrome_track_bg.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time_attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 25.55,
         init_player_pos_y = -119.78,
         init_player_angle = -111.565,
@@ -98,7 +101,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/black_hole_track1.png",
         bg_tex_path = "gfx/black_hole_track_bg.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time_attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 25.55,
         init_player_pos_y = -119.78,
         init_player_angle = -111.565,
@@ -110,7 +113,7 @@ LEAGUE_1_RACES = [
         floor_tex_path = "gfx/space_hangar_track1.png",
         bg_tex_path = "gfx/space_hangar_bg_no_deco.png",
         required_laps = STD_REQUIRED_LAPS,
-        race_mode = "time_attack",
+        race_mode = TIME_ATTACK_RACE_MODE,
         init_player_pos_x = 25.55,
         init_player_pos_y = -119.78,
         init_player_angle = -111.565,
@@ -1,8 +1,8 @@
 # Settings for the machines that are controllable in the game.
 
-import pygame
 from machine import Machine
 from animation import Animation
+from assets import ImageList # images are loaded on first use
 
 # physics variables of the player machine
 PLAYER_COLLISION_RECT_WIDTH = 1 # width of the player collider (the same for all machines)
@@ -46,19 +46,19 @@ PURPLE_COMET_GRAPHICS_ROOT_PATH = "gfx/machines/purple_comet/"
 PURPLE_COMET_SHADOW_IMAGE_PATH = PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine_shadow.png"
 
 PURPLE_COMET_DRIVING_ANIMATION = Animation(
-    frames = [
-        pygame.image.load(PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0001.png"),
-        pygame.image.load(PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0002.png"),
-        pygame.image.load(PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0003.png"),
-        pygame.image.load(PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0004.png")
-    ],
+    frames = ImageList([
+        PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0001.png",
+        PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0002.png",
+        PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0003.png",
+        PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0004.png"
+    ]),
     speed = DRIVING_ANIM_SPEED
 )
 
 PURPLE_COMET_IDLE_ANIMATION = Animation(
-    frames = [
-        pygame.image.load(PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0000.png")
-    ],
+    frames = ImageList([
+        PURPLE_COMET_GRAPHICS_ROOT_PATH + "violet_machine0000.png"
+    ]),
     speed = IDLE_ANIM_SPEED
 )
 
@@ -33,3 +33,107 @@ FOG_DENSITY = 100
 # how fast the background moves when the player rotates
 BACKGROUND_ROTATION_SPEED = 120
 
+# Algorithms that the Mode7 renderer can use to compute the floor pixels:
+# "per-pixel" - rotates and projects every single pixel of the floor
+# "scanline" - projects the first pixel of every row and walks along the row by addition (like the SNES hardware)
+FLOOR_SAMPLERS = ["per-pixel", "scanline"]
+
+# floor sampler that is used if none else is specified
+STD_FLOOR_SAMPLER = "per-pixel"
+
+# Whether the Mode7 renderer writes its frames directly into the pixel memory of the display surface.
+# If set to False, frames are rendered into a separate array 
+# which is copied to the display surface in every frame (slower, kept for comparison).
+ZERO_COPY_PRESENTATION = True
+
+# Formats in which the Mode7 renderer can store the pixels of its textures and frames:
+# "rgb" - three separate color components per pixel
+# "packed" - all color components of a pixel packed into one 32-bit word (less memory traffic, integer shading)
+PIXEL_FORMATS = ["rgb", "packed"]
+
+# pixel format that is used if none else is specified
+STD_PIXEL_FORMAT = "rgb"
+
+# Memory budget (in megabytes) of the cache for the textures used by the Mode7 renderer.
+# Textures that are still in the cache do not need to be decoded again when (re-)loading a race.
+TEXTURE_CACHE_BUDGET_MB = 256
+
+# Scaled images of billboards (see billboard module) are cached per size bucket:
+# number of buckets per unit of the scale factor (the scale factor is 1 at the distance between camera and player).
+BILLBOARD_SCALE_STEPS = 32
+
+# maximum number of scaled billboard images in the cache
+BILLBOARD_CACHE_SIZE = 1024
+
+# Whether the floor is sampled from a mip chain of the floor texture (see texture.build_mip_chain):
+# rows near the horizon, where neighbouring pixels are far apart on the floor,
+# sample a smaller, pre-filtered version of the texture (less shimmering, fewer cache misses).
+MIPMAPPED_FLOOR = True
+
+# maximum number of levels in the mip chain of a texture (including the full resolution level)
+MAX_MIP_LEVELS = 8
+
+# Added to the mip level chosen for every row.
+# Positive values pick smaller levels earlier (blurrier but faster), negative values sharper ones.
+MIP_LEVEL_BIAS = 0
+
+# Memory layouts in which the Mode7 renderer can store the floor texture (see texture module):
+# "linear" - pixels stored column by column (as returned by pygame)
+# "tiled" - pixels stored in small square tiles (sampling touches fewer cache lines when the camera is rotated)
+TEXTURE_LAYOUTS = ["linear", "tiled"]
+
+# floor texture layout that is used if none else is specified
+STD_TEXTURE_LAYOUT = "linear"
+
+# side length (in pixels) of the tiles of the tiled texture layout (must be a power of 2)
+TEXTURE_TILE_SIZE = 8
+
+# Whether the internal resolution of the Mode7 renderer is adapted to the frame rate (see resolution module):
+# the floor is rendered at a lower resolution (and scaled up) while frames take longer than the frame budget.
+# Meant for weaker machines, so it is off by default.
+DYNAMIC_RESOLUTION = False
+
+# Pixel steps that the dynamic resolution can choose from, from highest to lowest resolution
+# (with a pixel step of s, every s-th column and row is rendered, see Mode7.set_pixel_step).
+DYNAMIC_RESOLUTION_PIXEL_STEPS = [1, 2, 3, 4]
+
+# number of recent frames whose median frame time is compared to the frame budget
+DYNAMIC_RESOLUTION_WINDOW = 30
+
+# The resolution is lowered when the median frame time exceeds this fraction of the frame budget
+# and raised when the frame time expected at the higher resolution stays below the second fraction.
+# The gap between the two (and the pessimistic estimate, see ResolutionController) keeps the resolution from oscillating.
+DYNAMIC_RESOLUTION_LOWER_LOAD = 1.0
+DYNAMIC_RESOLUTION_RAISE_LOAD = 0.8
+
+# number of frames of the camera path that the benchmark (see benchmark module) measures per renderer variant
+BENCHMARK_FRAMES = 240
+
+# number of frames that the benchmark renders before measuring a renderer variant (after compiling its kernel)
+BENCHMARK_WARMUP_FRAMES = 20
+
+# Whether the compiled render and collision kernels are cached on disk (see kernel_cache module),
+# so that they are only compiled on the first launch instead of on every launch.
+JIT_CACHE_ENABLED = True
+
+# directory (relative to the game directory) that the compiled kernels are cached in
+JIT_CACHE_DIRECTORY = "jit_cache"
+
+# Number of threads that the Mode7 renderer renders with (0: numba's default, i.e. one per CPU core).
+# On machines shared with other processes (and the audio thread), fewer threads can give steadier frame times.
+RENDER_THREADS = 0
+
+# Ways in which the floor is split into blocks of pixels that are rendered in parallel:
+# "rows" - one block per row (the per-row values are computed once per block and pixels are written in memory order)
+# "column blocks" - blocks of RENDER_COLUMN_BLOCK_WIDTH columns (all rows)
+# "tiles" - square tiles of RENDER_TILE_SIZE x RENDER_TILE_SIZE pixels
+RENDER_PARTITIONS = ["rows", "column blocks", "tiles"]
+
+# render partition that is used if none else is specified
+STD_RENDER_PARTITION = "rows"
+
+# number of columns per block of the "column blocks" render partition
+RENDER_COLUMN_BLOCK_WIDTH = 8
+
+# side length (in pixels) of the tiles of the "tiles" render partition
+RENDER_TILE_SIZE = 32
@@ -0,0 +1,40 @@
+# Settings for the headless simulation of races (see simulation module).
+
+# Fixed time (in seconds) that a single simulation step advances the race by.
+SIMULATION_TIMESTEP = 1 / 60
+
+# Maximum number of steps a simulation runs if not specified otherwise
+# (prevents simulations from running forever when the machine never finishes the race).
+MAX_SIMULATION_STEPS = 60 * 60 * 10
+
+# ------------- driving policies (see driving_policies module) -------------
+
+# Racing lines for the waypoint driving policy, keyed by track name.
+# A racing line is a closed loop of waypoints (x, y) in track coordinates, in driving direction.
+# The first waypoint is the first one a machine heads for after the start.
+RACING_LINES = {
+    "track 2023": [
+        (27.2, -50), (35, -33), (62, -33), (68, -45), (68, -118), (62, -125.6), (57, -132),
+        (57, -152), (50, -157.7), (39, -160), (30, -163), (27.2, -150), (27.2, -110)
+    ]
+}
+
+# distance to a waypoint at which a machine switches to the next waypoint
+WAYPOINT_REACH_RADIUS = 6
+
+# angle (in radians) between machine and direction to the next waypoint below which the machine does not steer
+WAYPOINT_STEERING_TOLERANCE = 0.05
+
+# angle (in radians) between machine and direction to the next waypoint below which the machine accelerates
+WAYPOINT_THROTTLE_ANGLE = 0.6
+
+# angle (in radians) between machine and direction to the next waypoint below which the machine uses its booster
+WAYPOINT_BOOST_ANGLE = 0.1
+
+# ------------- parameter sweeps (see sweep module) -------------
+
+# number of parameter combinations simulated together in a batch (and stored in one results file)
+SWEEP_CHUNK_SIZE = 64
+
+# number of simulation steps between two samples of the energy curves
+SWEEP_ENERGY_SAMPLE_INTERVAL = 30
@@ -1,6 +1,6 @@
 # Settings for the in-race UI.
 
-import pygame
+from assets import ImageList # images are loaded on first use
 from settings.renderer_settings import WIDTH, HEIGHT
 from settings.machine_settings import PURPLE_COMET_MAX_SPEED # for speed display factor
 
@@ -43,15 +43,15 @@ SPEED_DISPLAY_MULTIPLIER = 1426 / PURPLE_COMET_MAX_SPEED # so max speed of Purpl
 
 
 # standard paths for the number sprites used in the game
-NUMBER_IMAGES = [ # index = pictured number
-    pygame.image.load('gfx/numbers/small_numbers0.png'),
-    pygame.image.load('gfx/numbers/small_numbers1.png'),
-    pygame.image.load('gfx/numbers/small_numbers2.png'),
-    pygame.image.load('gfx/numbers/small_numbers3.png'),
-    pygame.image.load('gfx/numbers/small_numbers4.png'),
-    pygame.image.load('gfx/numbers/small_numbers5.png'),
-    pygame.image.load('gfx/numbers/small_numbers6.png'),
-    pygame.image.load('gfx/numbers/small_numbers7.png'),
-    pygame.image.load('gfx/numbers/small_numbers8.png'),
-    pygame.image.load('gfx/numbers/small_numbers9.png'),
-]
\ No newline at end of file
+NUMBER_IMAGES = ImageList([ # index = pictured number
+    'gfx/numbers/small_numbers0.png',
+    'gfx/numbers/small_numbers1.png',
+    'gfx/numbers/small_numbers2.png',
+    'gfx/numbers/small_numbers3.png',
+    'gfx/numbers/small_numbers4.png',
+    'gfx/numbers/small_numbers5.png',
+    'gfx/numbers/small_numbers6.png',
+    'gfx/numbers/small_numbers7.png',
+    'gfx/numbers/small_numbers8.png',
+    'gfx/numbers/small_numbers9.png',
+])
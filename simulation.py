@@ -0,0 +1,106 @@
+# Module for simulating races without a window, renderer or sound.
+#
+# A simulation drives a player with a stream of inputs (see controls module)
+# and advances the race at a fixed timestep instead of the wall clock,
+# so races can be simulated much faster than real time (e.g. for batch evaluation on machines without a display).
+# The physics and lap counting are the same as in the game (Player and Race classes).
+
+from player import Player
+from controls import InputState
+
+from settings.simulation_settings import SIMULATION_TIMESTEP, MAX_SIMULATION_STEPS
+
+class Simulation:
+    # Parameters:
+    # machine - the machine driven in the simulated race
+    # race - the simulated race
+    # timestep - time (in seconds) that a single step advances the race by
+    def __init__(self, machine, race, timestep = SIMULATION_TIMESTEP):
+        self.race = race
+        self.timestep = timestep
+
+        self.player = Player(
+            machine = machine,
+            current_race = race
+        )
+
+        self.reset()
+
+    # (Re-)starts the simulated race.
+    def reset(self):
+        self.race.reset_data()
+        self.player.current_race = self.race
+        self.player.reinitialize()
+
+        # simulated time since race start (in seconds) and number of steps done
+        self.time = 0.0
+        self.steps = 0
+
+        # simulated time at which the player completed each lap so far
+        self.lap_completion_times = []
+
+    # Advances the simulated race by a single step.
+    #
+    # Parameters:
+    # inputs - state of the racing controls in this step (InputState)
+    # delta - time to advance the race by (the fixed timestep if None)
+    # time - race time after this step (the current time advanced by delta if None),
+    #   lets replays reproduce the race clock of the game exactly (see replay module)
+    def step(self, inputs, delta = None, time = None):
+        if delta is None:
+            delta = self.timestep
+
+        if time is None:
+            time = self.time + delta
+        self.time = time
+        self.steps += 1
+
+        # same updates as in a frame of the game (see App.update)
+        completed_laps = self.race.player_completed_laps
+        self.player.update(self.time, delta, inputs)
+        self.player.update_race_progress()
+
+        if self.race.player_completed_laps > completed_laps:
+            self.lap_completion_times.append(self.time)
+
+    # Returns True if and only if the simulated race is over
+    # (the player finished or their machine was destroyed).
+    def is_over(self):
+        return self.player.finished or self.player.destroyed
+
+    # Runs the simulation with the inputs from the passed stream until the race is over,
+    # the stream ends or the maximum number of steps is reached.
+    #
+    # Parameters:
+    # input_stream - iterable of InputState objects (one per step)
+    #   or of (InputState, delta) pairs to simulate with variable timesteps
+    # max_steps - maximum number of steps to run
+    #
+    # Returns the number of steps done.
+    def run(self, input_stream, max_steps = MAX_SIMULATION_STEPS):
+        for inputs in input_stream:
+            if self.is_over() or self.steps >= max_steps:
+                break
+
+            if isinstance(inputs, InputState):
+                self.step(inputs)
+            else:
+                self.step(*inputs)
+
+        return self.steps
+
+    # Returns the current state of the simulated player as a dict
+    # (e.g. for logging or comparing simulation runs).
+    def state(self):
+        return {
+            "time": self.time,
+            "position_x": float(self.player.position[0]),
+            "position_y": float(self.player.position[1]),
+            "angle": float(self.player.angle),
+            "speed": float(self.player.current_speed),
+            "centri": float(self.player.centri),
+            "energy": float(self.player.current_energy),
+            "completed_laps": self.race.player_completed_laps,
+            "finished": self.player.finished,
+            "destroyed": self.player.destroyed
+        }
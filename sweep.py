@@ -0,0 +1,213 @@
+# Command-line tool for sweeping machine parameters (e.g. for balancing the machines of a league).
+#
+# Simulates a race for every combination of the passed parameter ranges
+# (based on one of the machines in MACHINES) with a driving policy (see driving_policies module)
+# and stores lap times, wall hits and energy curves of every combination.
+#
+# The combinations are split into chunks of SWEEP_CHUNK_SIZE combinations
+# that are simulated in lockstep (see batch_physics module) by a pool of worker processes.
+# Every chunk is written to its own results file in the output directory as soon as it is done,
+# so an interrupted sweep can be resumed by running the same command again (finished chunks are skipped).
+#
+# Example:
+# python sweep.py results/comet --race 1 --machine 0 --param acceleration=0.5:1.5:11 --param rotation_speed=2,2.5,3
+#
+# The results can be loaded with load_results (one array per column, one row per combination).
+
+import argparse
+import copy
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy
+
+from batch_physics import MachineBatch, MACHINE_PARAMETERS
+from files import write_file_atomically
+from driving_policies import WaypointPolicy, ScriptedPolicy
+
+from settings.machine_settings import MACHINES
+from settings.league_settings import LEAGUE_1_RACES
+from settings.simulation_settings import SIMULATION_TIMESTEP, MAX_SIMULATION_STEPS
+from settings.simulation_settings import SWEEP_CHUNK_SIZE, SWEEP_ENERGY_SAMPLE_INTERVAL
+
+# file in the output directory that describes the sweep (used to check that a resumed sweep is the same sweep)
+CONFIG_FILE_NAME = "sweep.json"
+
+# Parses a parameter range given on the command line.
+# Supported formats:
+# name=start:stop:count - count evenly spaced values from start to stop (both inclusive)
+# name=v1,v2,... - the listed values
+#
+# Returns the parameter name and the list of its values.
+def parse_param_range(text):
+    name, separator, values = text.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError("expected name=start:stop:count or name=v1,v2,... but got " + repr(text))
+    if name not in MACHINE_PARAMETERS:
+        raise argparse.ArgumentTypeError("unknown machine parameter " + repr(name) + " (choose from " + ", ".join(MACHINE_PARAMETERS) + ")")
+
+    try:
+        if ":" in values:
+            start, stop, count = values.split(":")
+            return name, numpy.linspace(float(start), float(stop), int(count)).tolist()
+        return name, [float(value) for value in values.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid values for parameter " + repr(name) + ": " + repr(values))
+
+# Returns the parameter values of all combinations of the sweep described by the passed config
+# as a dict mapping each swept parameter name to an array (one entry per combination).
+def param_combinations(config):
+    names = [name for name, _ in config["params"]]
+    grids = numpy.meshgrid(*[values for _, values in config["params"]], indexing = "ij")
+    return {name: grid.ravel() for name, grid in zip(names, grids)}
+
+# Returns the number of combinations of the sweep described by the passed config.
+def num_combinations(config):
+    return int(numpy.prod([len(values) for _, values in config["params"]]))
+
+# Returns the path of the results file of the chunk with the passed index.
+def chunk_path(output_dir, chunk_index):
+    return os.path.join(output_dir, "chunk_" + str(chunk_index).zfill(6) + ".npz")
+
+# Creates the driving policy described by the passed config for the passed race.
+def create_policy(config, race):
+    if config["policy"] == "waypoints":
+        return WaypointPolicy.for_race(race)
+    return ScriptedPolicy.load(config["inputs"])
+
+# Runs on a worker process:
+# simulates the combinations of the chunk with the passed index and writes its results file.
+def run_chunk(config, chunk_index):
+    race = LEAGUE_1_RACES[config["race"]]
+    base_machine = MACHINES[config["machine"]]
+
+    # the machines of the chunk are copies of the base machine with the swept parameters overridden
+    combinations = param_combinations(config)
+    first = chunk_index * config["chunk_size"]
+    last = min(first + config["chunk_size"], num_combinations(config))
+    machines = []
+    for combination in range(first, last):
+        machine = copy.copy(base_machine)
+        for name, values in combinations.items():
+            setattr(machine, name, float(values[combination]))
+        machines.append(machine)
+
+    batch = MachineBatch(machines, race, config["timestep"])
+    policy = create_policy(config, race)
+    policy.reset(batch)
+
+    # energy curves: energy of every machine at every sample (nan once the race is over for a machine)
+    sample_interval = config["energy_sample_interval"]
+    energy_curves = numpy.full((batch.size, config["max_steps"] // sample_interval + 1), numpy.nan)
+    energy_curves[:, 0] = batch.energy
+
+    while batch.steps < config["max_steps"] and not batch.all_over():
+        batch.step(policy.inputs(batch))
+
+        if batch.steps % sample_interval == 0:
+            running = ~(batch.finished | batch.destroyed)
+            energy_curves[running, batch.steps // sample_interval] = batch.energy[running]
+
+    lap_times = numpy.diff(batch.lap_completion_times, axis = 1, prepend = 0.0)
+    race_times = numpy.where(batch.finished, batch.lap_completion_times[:, -1], numpy.nan)
+
+    columns = {
+        "combination": numpy.arange(first, last),
+        "lap_times": lap_times,
+        "race_time": race_times,
+        "wall_hits": batch.wall_hits,
+        "finished": batch.finished,
+        "destroyed": batch.destroyed,
+        "final_energy": batch.energy,
+        "energy_curve": energy_curves
+    }
+    for name in MACHINE_PARAMETERS:
+        columns[name] = batch.params[name]
+
+    write_file_atomically(chunk_path(config["output_dir"], chunk_index), lambda file: numpy.savez(file, **columns))
+
+    return chunk_index
+
+# Runs the sweep described by the passed config with the passed number of worker processes.
+# Chunks whose results file already exists are skipped.
+def run_sweep(config, workers):
+    os.makedirs(config["output_dir"], exist_ok = True)
+
+    # a resumed sweep must have been started with the same config (otherwise the chunks would not fit together)
+    config_path = os.path.join(config["output_dir"], CONFIG_FILE_NAME)
+    if os.path.exists(config_path):
+        with open(config_path) as file:
+            if json.load(file) != config:
+                raise SystemExit("the output directory contains results of a different sweep: " + config["output_dir"])
+    else:
+        with open(config_path, "w") as file:
+            json.dump(config, file, indent = 4)
+
+    num_chunks = -(-num_combinations(config) // config["chunk_size"])
+    pending_chunks = [index for index in range(num_chunks) if not os.path.exists(chunk_path(config["output_dir"], index))]
+    print(str(num_combinations(config)) + " combinations in " + str(num_chunks) + " chunks, "
+        + str(num_chunks - len(pending_chunks)) + " already done")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(run_chunk, config, index) for index in pending_chunks]
+        for done, future in enumerate(as_completed(futures), start = 1):
+            future.result()
+            print("chunk " + str(done) + "/" + str(len(pending_chunks)) + " done ("
+                + str(round(time.perf_counter() - start, 1)) + " s)")
+
+# Loads the results of the sweep in the passed output directory
+# (only the chunks that are done so far).
+#
+# Returns a dict mapping each column name to an array with one row per combination.
+def load_results(output_dir):
+    with open(os.path.join(output_dir, CONFIG_FILE_NAME)) as file:
+        config = json.load(file)
+
+    num_chunks = -(-num_combinations(config) // config["chunk_size"])
+    chunks = []
+    for index in range(num_chunks):
+        path = chunk_path(output_dir, index)
+        if os.path.exists(path):
+            with numpy.load(path) as chunk:
+                chunks.append({name: chunk[name] for name in chunk.files})
+
+    if not chunks:
+        return {}
+    return {name: numpy.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+def main():
+    parser = argparse.ArgumentParser(description = "Sweeps machine parameters and records lap times, wall hits and energy curves.")
+    parser.add_argument("output_dir", help = "directory for the results (an existing sweep in it is resumed)")
+    parser.add_argument("--race", type = int, default = 1, help = "index of the race in LEAGUE_1_RACES")
+    parser.add_argument("--machine", type = int, default = 0, help = "index of the base machine in MACHINES")
+    parser.add_argument("--param", type = parse_param_range, action = "append", default = [],
+        help = "swept parameter as name=start:stop:count or name=v1,v2,... (can be repeated)")
+    parser.add_argument("--policy", choices = ["waypoints", "scripted"], default = "waypoints", help = "driving policy")
+    parser.add_argument("--inputs", help = ".npy file with the input sequence of the scripted policy")
+    parser.add_argument("--workers", type = int, default = os.cpu_count(), help = "number of worker processes")
+    parser.add_argument("--chunk-size", type = int, default = SWEEP_CHUNK_SIZE, help = "combinations per chunk")
+    parser.add_argument("--max-steps", type = int, default = MAX_SIMULATION_STEPS, help = "maximum number of steps per race")
+    args = parser.parse_args()
+
+    if args.policy == "scripted" and args.inputs is None:
+        parser.error("the scripted policy needs an input sequence (--inputs)")
+
+    config = {
+        "output_dir": os.path.abspath(args.output_dir),
+        "race": args.race,
+        "machine": args.machine,
+        "params": [[name, values] for name, values in args.param],
+        "policy": args.policy,
+        "inputs": os.path.abspath(args.inputs) if args.inputs is not None else None,
+        "chunk_size": args.chunk_size,
+        "max_steps": args.max_steps,
+        "timestep": SIMULATION_TIMESTEP,
+        "energy_sample_interval": SWEEP_ENERGY_SAMPLE_INTERVAL
+    }
+    run_sweep(config, args.workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+# Module for everything related to the textures that are sampled by the Mode7 renderer.
+#
+# Textures can be represented in two pixel formats (see PIXEL_FORMATS in the renderer settings):
+# "rgb" - W x H x 3 array holding the three color components of every pixel separately
+# "packed" - W x H array of 32-bit words holding all three color components of a pixel in a single word
+#
+# and in two memory layouts (see TEXTURE_LAYOUTS in the renderer settings):
+# "linear" - the W x H (x 3) array as described above
+# "tiled" - W/T x H/T x T x T (x 3) array of square tiles of T x T pixels (T = TEXTURE_TILE_SIZE),
+#   the pixels of a tile are stored next to each other in memory (see tile_texture)
+
+import pygame
+import numpy
+import threading
+from collections import OrderedDict
+
+from settings.renderer_settings import TEXTURE_CACHE_BUDGET_MB, MAX_MIP_LEVELS, TEXTURE_TILE_SIZE
+
+# Packs the passed W x H x 3 array of RGB colors into a contiguous W x H array of 32-bit words.
+# Each color component is shifted by the respective bit shift from the passed (r, g, b) shifts.
+# Using the bit shifts of the display surface makes the packed words directly displayable.
+def pack_rgb(rgb_array, shifts):
+    rgb_array = rgb_array.astype(numpy.uint32)
+    return numpy.ascontiguousarray(
+        (rgb_array[:, :, 0] << shifts[0]) | (rgb_array[:, :, 1] << shifts[1]) | (rgb_array[:, :, 2] << shifts[2])
+    )
+
+# Inverse of pack_rgb:
+# unpacks the passed W x H array of 32-bit words into a W x H x 3 array of RGB colors.
+def unpack_rgb(packed_array, shifts):
+    rgb_array = numpy.empty(packed_array.shape + (3,), dtype = numpy.uint8)
+    for c in range(0, 3):
+        rgb_array[:, :, c] = (packed_array >> shifts[c]) & 0xFF
+    return rgb_array
+
+# Loads the image under the passed path and
+# returns an array of its pixels in the passed pixel format.
+#
+# Parameters:
+# path - file path of the image
+# pixel_format - "rgb" or "packed"
+# shifts - bit shifts of the color components (only used by the packed format)
+def load_texture_array(path, pixel_format, shifts):
+    # Create 3D array representing the pixels of the texture.
+    # More precisely: copies the pixels from the surface representing the texture
+    # into a new 3D array.
+    rgb_array = pygame.surfarray.array3d(pygame.image.load(path).convert())
+
+    if pixel_format == "packed":
+        return pack_rgb(rgb_array, shifts)
+    return rgb_array
+
+# Halves the resolution of the passed texture array (in the passed pixel format)
+# by averaging every 2 x 2 block of pixels into one pixel (box filter).
+def downsample(array, pixel_format, shifts):
+    rgb_array = unpack_rgb(array, shifts) if pixel_format == "packed" else array
+
+    # sum the four pixels of every block in a wider integer type, then divide with rounding
+    blocks = rgb_array.astype(numpy.uint16)
+    summed = blocks[0::2, 0::2] + blocks[1::2, 0::2] + blocks[0::2, 1::2] + blocks[1::2, 1::2]
+    halved = ((summed + 2) // 4).astype(numpy.uint8)
+
+    if pixel_format == "packed":
+        return pack_rgb(halved, shifts)
+    return numpy.ascontiguousarray(halved)
+
+# Builds the mip chain of the passed texture array:
+# a tuple of the texture at full, half, quarter, ... resolution (level 0 is the passed array).
+# Levels are added as long as both dimensions of the previous level are even (so every level still tiles seamlessly)
+# and at most MAX_MIP_LEVELS levels are built.
+def build_mip_chain(array, pixel_format, shifts):
+    levels = [array]
+    while len(levels) < MAX_MIP_LEVELS and levels[-1].shape[0] % 2 == 0 and levels[-1].shape[1] % 2 == 0:
+        levels.append(downsample(levels[-1], pixel_format, shifts))
+    return tuple(levels)
+
+# Rearranges the passed (linear) texture array into the tiled layout:
+# the pixel (x, y) ends up at index [x // T, y // T, x % T, y % T] with T = TEXTURE_TILE_SIZE.
+# Textures whose size is not a multiple of the tile size are padded with (unused) pixels.
+#
+# A sampler walking across the texture in any direction touches the pixels of only a few tiles
+# (that are contiguous in memory), whereas in the linear layout
+# every step across the columns of the array touches a different cache line.
+def tile_texture(array):
+    width, height = array.shape[:2]
+    tiles_x = -(-width // TEXTURE_TILE_SIZE)
+    tiles_y = -(-height // TEXTURE_TILE_SIZE)
+
+    padding = [(0, tiles_x * TEXTURE_TILE_SIZE - width), (0, tiles_y * TEXTURE_TILE_SIZE - height)] + [(0, 0)] * (array.ndim - 2)
+    padded = numpy.pad(array, padding, mode = "wrap")
+
+    tiles = padded.reshape((tiles_x, TEXTURE_TILE_SIZE, tiles_y, TEXTURE_TILE_SIZE) + array.shape[2:])
+    return numpy.ascontiguousarray(numpy.swapaxes(tiles, 1, 2))
+
+# Returns the arrays of the passed cache entry (an array or a tuple of arrays) as a tuple.
+def entry_arrays(entry):
+    if isinstance(entry, tuple):
+        return entry
+    return (entry,)
+
+# A process-wide cache for texture arrays, keyed by the path and representation of the texture.
+# Avoids decoding the same image files again when a race is restarted 
+# or when several races share the same textures.
+#
+# Besides the textures themselves, the cache also holds their mip chains (see build_mip_chain).
+# The level 0 of a mip chain is the cached texture itself.
+# Arrays shared by several entries are counted only once (see hold and release).
+#
+# The cache holds at most budget_bytes bytes of texture data.
+# If the budget is exceeded, the least recently used textures are evicted.
+# Note that the cached arrays are shared between all users and must not be modified.
+#
+# The cache can be used from several threads (e.g. by the asset preloader).
+# The lock is only held while the entries are looked up or added, textures are decoded, mipmapped and tiled outside of it,
+# so a thread asking for a cached texture never waits for a texture that another thread is loading.
+# A thread requesting a texture that another thread is currently loading waits for that load
+# instead of decoding the texture a second time.
+class TextureCache:
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0 # bytes of all distinct arrays held by the entries
+
+        # number of entries holding each array, keyed by the id of the array
+        # (the ids are unique since the entries keep the arrays alive)
+        self.array_holders = {}
+
+        # maps keys to arrays, ordered from least recently used to most recently used
+        self.entries = OrderedDict()
+
+        # keys of the entries that are currently being created, mapped to events that are set once they are done
+        self.loading = {}
+
+        # guards all accesses to the fields above
+        self.lock = threading.RLock()
+
+    # Returns the entry under the passed key.
+    # If it is not in the cache, it is created by calling the passed function (without holding the lock) and added.
+    # If another thread is already creating the entry, waits for it instead.
+    def get_or_create(self, key, create):
+        while True:
+            with self.lock:
+                # cache hit: mark entry as most recently used
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    return self.entries[key]
+
+                event = self.loading.get(key)
+                if event is None:
+                    # cache miss: this thread creates the entry
+                    event = threading.Event()
+                    self.loading[key] = event
+                    break
+
+            # Another thread is creating the entry: wait and look it up again
+            # (it might have failed or already been evicted, then this thread creates it).
+            event.wait()
+
+        try:
+            entry = create()
+            self.add(key, entry)
+        finally:
+            with self.lock:
+                del self.loading[key]
+            event.set()
+
+        return entry
+
+    # Returns the array of the texture under the passed path in the passed pixel format
+    # (see load_texture_array for the parameters).
+    # The texture is only loaded from disk if it is not in the cache yet.
+    def get(self, path, pixel_format, shifts):
+        return self.get_or_create(
+            (path, pixel_format, tuple(shifts)),
+            lambda: load_texture_array(path, pixel_format, shifts)
+        )
+
+    # Returns the mip chain of the texture under the passed path in the passed pixel format
+    # (see build_mip_chain, parameters as for get).
+    # The mip chain is only built if it is not in the cache yet.
+    def get_mip_chain(self, path, pixel_format, shifts):
+        return self.get_or_create(
+            (path, pixel_format, tuple(shifts), "mip chain"),
+            lambda: build_mip_chain(self.get(path, pixel_format, shifts), pixel_format, shifts)
+        )
+
+    # Returns the levels of the texture under the passed path in the tiled layout (see tile_texture):
+    # all levels of its mip chain if mipmapped is True, only the full resolution level otherwise.
+    # Other parameters as for get.
+    def get_tiled_levels(self, path, pixel_format, shifts, mipmapped):
+        def create():
+            if mipmapped:
+                levels = self.get_mip_chain(path, pixel_format, shifts)
+            else:
+                levels = (self.get(path, pixel_format, shifts),)
+            return tuple(tile_texture(level) for level in levels)
+
+        return self.get_or_create((path, pixel_format, tuple(shifts), "tiled", mipmapped), create)
+
+    # Adds the passed entry (array or tuple of arrays) under the passed key and makes room for it.
+    def add(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                self.release(self.entries.pop(key))
+            self.entries[key] = entry
+            self.hold(entry)
+            self.evict()
+
+    # Counts the arrays of the passed entry as held by one more entry.
+    # Only arrays that were not held by any entry before add to the used memory.
+    def hold(self, entry):
+        for array in entry_arrays(entry):
+            holders = self.array_holders.get(id(array), 0)
+            if holders == 0:
+                self.used_bytes += array.nbytes
+            self.array_holders[id(array)] = holders + 1
+
+    # Counts the arrays of the passed (removed) entry as held by one entry less.
+    # Arrays that are not held by any entry anymore no longer count towards the used memory.
+    def release(self, entry):
+        for array in entry_arrays(entry):
+            holders = self.array_holders[id(array)] - 1
+            if holders == 0:
+                del self.array_holders[id(array)]
+                self.used_bytes -= array.nbytes
+            else:
+                self.array_holders[id(array)] = holders
+
+    # Returns True if and only if the texture identified by the passed parameters is in the cache.
+    def contains(self, path, pixel_format, shifts):
+        with self.lock:
+            return (path, pixel_format, tuple(shifts)) in self.entries
+
+    # Changes the memory budget of the cache and evicts textures if necessary.
+    def set_budget(self, budget_bytes):
+        with self.lock:
+            self.budget_bytes = budget_bytes
+            self.evict()
+
+    # Evicts least recently used textures until the cache is within its memory budget.
+    # The most recently used texture is never evicted (even if it exceeds the budget on its own)
+    # since it is about to be used.
+    def evict(self):
+        while self.used_bytes > self.budget_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last = False)
+            self.release(entry)
+
+    # Removes all textures from the cache.
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.array_holders.clear()
+            self.used_bytes = 0
+
+# the texture cache shared by all Mode7 renderers
+TEXTURE_CACHE = TextureCache(TEXTURE_CACHE_BUDGET_MB * 1024 * 1024)
@@ -1,3 +1,14 @@
+from collision import CollisionRectSet, CollisionRaster, RASTER_EDGE_FLAG
+
+# Flags of the different surface classes on a track.
+# A combination of these flags describes which surfaces a collider is on (see Track.surface_flags).
+TRACK_SURFACE_FLAG = 1
+DASH_PLATE_FLAG = 2
+RAMP_FLAG = 4
+RECOVERY_ZONE_FLAG = 8
+FINISH_LINE_FLAG = 16
+KEY_CHECKPOINT_FLAG = 32
+
 # A class modelling (the collision map for) a race track.
 # Objects of the class hold a name and several lists of collision rects
 # modelling the track surface, ramps, different types of gimmicks and obstacles, ...
@@ -25,6 +36,19 @@ class Track:
         # (in the latter case, the player just falls off the track)
         self.has_guard_rails = has_guard_rails
 
+        # The lists of collision rects that are queried in every frame, stored as struct of arrays.
+        # Built once per track, support fast single queries (via a spatial index) and batch queries.
+        self.track_surface_set = CollisionRectSet(self.track_surface_rects)
+        self.dash_plate_set = CollisionRectSet(self.dash_plate_rects)
+        self.recovery_zone_set = CollisionRectSet(self.recovery_zone_rects)
+        self.ramp_set = CollisionRectSet(self.ramp_rects)
+        self.finish_line_set = CollisionRectSet([self.finish_line_collider])
+        self.key_checkpoint_set = CollisionRectSet([key_checkpoint.collider for key_checkpoint in self.key_checkpoints])
+
+        # Optional raster of the surface classes of this track (see bake_surface_raster).
+        # If present, most collision queries take a single array lookup.
+        self.surface_raster = None
+
 
     
     # ------------------ methods for collision detection ---------------------------
@@ -41,35 +65,131 @@ class Track:
     # Parameters:
     # other (CollisionRect)
     def is_on_track(self, other):
-        return collides_with_list(self.track_surface_rects, other)
+        return self.is_on_surface(other, TRACK_SURFACE_FLAG, self.track_surface_set)
 
     # Determines whether the passed rectangular collider hits a dash plate on the track or not.
     #
     # Parameters:
     # other (CollisionRect)
     def is_on_dash_plate(self, other):
-        return collides_with_list(self.dash_plate_rects, other)
+        return self.is_on_surface(other, DASH_PLATE_FLAG, self.dash_plate_set)
 
     # Determines whether the passed rectangular collider hits a recovery zone on the track.
     #
     # Parameters:
     # other (CollisionRect)
     def is_on_recovery_zone(self, other):
-        return collides_with_list(self.recovery_zone_rects, other)
+        return self.is_on_surface(other, RECOVERY_ZONE_FLAG, self.recovery_zone_set)
 
     # Determines whether the passed rectangular collider is on a ramp or not.
     #
     # Parameters:
     # other (CollisionRect)
     def is_on_ramp(self, other):
-        return collides_with_list(self.ramp_rects, other)
+        return self.is_on_surface(other, RAMP_FLAG, self.ramp_set)
 
     # Determines whether the passed rectangular collider is on the finish line or not.
     #
     # Parameters:
     # other (CollisionRect)
     def is_on_finish_line(self, other):
-        return self.finish_line_collider.overlap(other)
+        return self.is_on_surface(other, FINISH_LINE_FLAG, self.finish_line_set)
+
+    # Returns the flags of all surface classes (see top of module) 
+    # that the passed rectangular collider is on.
+    # Takes a single lookup if the track has a surface raster for colliders of this size.
+    #
+    # Parameters:
+    # other (CollisionRect)
+    def surface_flags(self, other):
+        flags = self.raster_flags(other)
+        if flags is not None:
+            return flags
+
+        # no raster or ambiguous raster cell: test the rects
+        flags = 0
+        for rect_set, flag in self.surface_classes():
+            if rect_set.collides(other):
+                flags |= flag
+        return flags
+
+    # Determines whether the passed rectangular collider is on the surface class with the passed flag.
+    # The passed rect set (containing the rects of that surface class) is only tested
+    # if the surface raster cannot answer the query.
+    def is_on_surface(self, other, flag, rect_set):
+        flags = self.raster_flags(other)
+        if flags is not None:
+            return flags & flag != 0
+        return rect_set.collides(other)
+
+    # Returns the surface flags of the passed rectangular collider according to the surface raster
+    # or None if the raster cannot answer the query 
+    # (no raster, raster baked for another collider size or the collider is at the border of a surface).
+    def raster_flags(self, other):
+        if self.surface_raster is None or not self.surface_raster.supports(other):
+            return None
+
+        flags = self.surface_raster.lookup(float(other.position[0]), float(other.position[1]))
+        if flags & RASTER_EDGE_FLAG:
+            return None
+        return flags
+
+    # Returns pairs of (rect set, flag) for all surface classes of this track.
+    def surface_classes(self):
+        return [
+            (self.track_surface_set, TRACK_SURFACE_FLAG),
+            (self.dash_plate_set, DASH_PLATE_FLAG),
+            (self.ramp_set, RAMP_FLAG),
+            (self.recovery_zone_set, RECOVERY_ZONE_FLAG),
+            (self.finish_line_set, FINISH_LINE_FLAG),
+            (self.key_checkpoint_set, KEY_CHECKPOINT_FLAG)
+        ]
+
+    # Bakes all surface classes of this track into a raster (see CollisionRaster)
+    # so that surface queries for colliders of the passed size take a single array lookup.
+    # The queries give exactly the same results as without the raster.
+    #
+    # Parameters:
+    # collider_width, collider_height - size of the colliders the raster is baked for
+    # cells_per_unit - resolution of the raster
+    # max_cells - upper limit for the number of raster cells (resolution is lowered if exceeded)
+    # cache_path - path of the file the raster is cached in (None: no caching)
+    def bake_surface_raster(self, collider_width, collider_height, cells_per_unit, max_cells, cache_path = None):
+        if cache_path is None:
+            self.surface_raster = CollisionRaster.bake(
+                self.surface_classes(), collider_width, collider_height, cells_per_unit, max_cells
+            )
+        else:
+            self.surface_raster = CollisionRaster.load_or_bake(
+                cache_path, self.surface_classes(), collider_width, collider_height, cells_per_unit, max_cells
+            )
+
+
+
+    # Batch versions of the methods above:
+    # determine for each of the passed positions whether a collider of the passed size 
+    # centered at that position is on the track surface/a dash plate/a recovery zone/a ramp.
+    #
+    # Parameters:
+    # positions - (number of positions) x 2 array of collider centers
+    # width, height - size of the colliders
+    #
+    # Return a boolean array with one entry per position.
+
+    def is_on_track_batch(self, positions, width, height):
+        return self.track_surface_set.collides_batch(positions, width, height)
+
+    def is_on_dash_plate_batch(self, positions, width, height):
+        return self.dash_plate_set.collides_batch(positions, width, height)
+
+    def is_on_recovery_zone_batch(self, positions, width, height):
+        return self.recovery_zone_set.collides_batch(positions, width, height)
+
+    def is_on_ramp_batch(self, positions, width, height):
+        return self.ramp_set.collides_batch(positions, width, height)
+
+    def is_on_finish_line_batch(self, positions, width, height):
+        return self.finish_line_set.collides_batch(positions, width, height)
 
 
 
@@ -85,9 +205,13 @@ class Track:
     # is over one (or more) key checkpoint.
     # If yes, these key checkpoints are marked as passed.
     def update_key_checkpoints(self, player_coll):
-        for key_checkpoint in self.key_checkpoints:
-            if key_checkpoint.collider.overlap(player_coll):
-                key_checkpoint.passed = True
+        # nothing to do if the surface raster already tells that the player is not over a key checkpoint
+        flags = self.raster_flags(player_coll)
+        if flags is not None and not flags & KEY_CHECKPOINT_FLAG:
+            return
+
+        for index in self.key_checkpoint_set.overlapping_indices(player_coll):
+            self.key_checkpoints[index].passed = True
 
     # Returns true if and only if 
     # the player has passed all key checkpoints on the track.
@@ -129,16 +253,3 @@ class KeyCheckpoint:
     def __init__(self, collider):
         self.collider = collider
         self.passed = False
-
-# Checks whether the passed rectangular collider
-# collides with any of the colliders in the passed list.
-#
-# Parameters:
-# list      - list of CollisionRect
-# other     - CollisionRect
-def collides_with_list(coll_list, other):
-    for rect_coll in coll_list:
-        if rect_coll.overlap(other):
-            return True
-    return False
-